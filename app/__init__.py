@@ -2,8 +2,8 @@ from flask import Flask
 from dotenv import load_dotenv
 import os
 import logging
+import httpx
 from openai import OpenAI
-from elevenlabs import set_api_key, voices
 from pinecone import Pinecone
 
 # Configure logging
@@ -31,8 +31,15 @@ def init_openai():
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is not set")
         
-        # Initialize with just the API key
-        _openai_client = OpenAI(api_key=api_key)
+        # Share one pooled HTTP/2 connection across all OpenAI calls so TLS
+        # handshakes are paid once per process instead of once per request
+        http_client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=100),
+            # Fail fast on connect, but let slow chat completions finish
+            timeout=httpx.Timeout(60.0, connect=5.0)
+        )
+        _openai_client = OpenAI(api_key=api_key, http_client=http_client)
         
         # Test the client with a simple completion
         logger.debug("Testing OpenAI connection...")
@@ -78,9 +85,9 @@ def init_elevenlabs():
     """Initialize ElevenLabs configuration"""
     logger.info("🔄 Initializing ElevenLabs configuration...")
     try:
-        set_api_key(os.getenv('ELEVENLABS_API_KEY'))
-        from app.services.voice_service import initialize_voices
+        from app.services.voice_service import initialize_voices, start_audio_sweeper
         
+        start_audio_sweeper()
         if initialize_voices():
             logger.info("✅ ElevenLabs initialized successfully with voice list")
             return True
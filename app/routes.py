@@ -2,14 +2,13 @@ from flask import Blueprint, request, send_from_directory, url_for
 import os
 import logging
 from pathlib import Path
-from datetime import datetime
 from app.services.voice_service import (
     generate_voice_response, get_initial_greeting,
     get_location_confirmation, get_search_acknowledgment,
     format_place_results, format_place_details, cleanup_audio_file,
-    handle_place_reference, conversation_context, handle_interruption,
+    conversation_context, handle_interruption,
     add_to_history, update_user_preferences, add_mentioned_place,
-    get_conversation_summary
+    get_conversation_summary, bind_call_context, TEMP_AUDIO_DIR
 )
 from app.services.openai_service import process_user_query, generate_response, handle_aspect_query
 from app.services.pinecone_service import search_places, get_place_details, search_by_attribute
@@ -19,9 +18,10 @@ import json
 main = Blueprint('main', __name__)
 logger = logging.getLogger(__name__)
 
-# Create a directory for temporary audio files
-TEMP_AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'temp_audio')
-os.makedirs(TEMP_AUDIO_DIR, exist_ok=True)
+@main.before_request
+def bind_call():
+    """Load the conversation context for the Twilio call making this request"""
+    bind_call_context(request.values.get('CallSid'))
 
 @main.route("/voice", methods=['GET', 'POST'])
 def voice():
@@ -33,13 +33,7 @@ def voice():
         logger.info("=== Call Setup ===")
         
         # Initialize conversation context for new call
-        conversation_context.conversation_history = []
-        conversation_context.call_start_time = datetime.now()
-        conversation_context.previous_queries = []
-        conversation_context.previous_responses = []
-        conversation_context.mentioned_places = set()
-        conversation_context.user_preferences = {}
-        conversation_context.current_voice = None
+        conversation_context.start_new_call()
         
         logger.info("✅ Conversation context initialized")
         
@@ -250,7 +244,7 @@ def continue_results():
             place_id = conversation_context.handle_place_reference(speech_result)
             if place_id:
                 details_response = format_place_details(place_id)
-                audio_paths = generate_voice_response(details_response)
+                audio_paths = generate_voice_response(details_response, conversation_type="details", batch_synthesis=True)
                 
                 if audio_paths:
                     for audio_path in audio_paths:
@@ -271,7 +265,7 @@ def continue_results():
         
         # If no interruption, continue with remaining results
         if conversation_context.remaining_results:
-            remaining_response = format_place_results(conversation_context.remaining_results)
+            remaining_response = format_place_results(list(conversation_context.remaining_results))
             audio_chunks = generate_voice_response(remaining_response)
             
             if audio_chunks:
@@ -372,7 +366,7 @@ def handle_follow_up():
             logger.info(f"💬 Generated response: '{response_text}'")
             
             logger.info("🎵 Generating voice response...")
-            audio_paths = generate_voice_response(response_text)
+            audio_paths = generate_voice_response(response_text, conversation_type="details", batch_synthesis=True)
             if audio_paths:
                 logger.info(f"✅ Generated {len(audio_paths)} audio segments")
                 for audio_path in audio_paths:
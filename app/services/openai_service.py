@@ -1,11 +1,8 @@
-from openai import OpenAI
-import os
 import json
 import logging
 from app import get_openai_client
 
 logger = logging.getLogger(__name__)
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
 def analyze_query_intent(query, conversation_context=None):
     """
@@ -228,7 +225,7 @@ def generate_direct_response(query, conversation_context):
             }
         ]
         
-        response = client.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-4-turbo-preview",
             messages=messages,
             max_tokens=150,
@@ -385,7 +382,7 @@ def generate_response(query, places, conversation_context):
             }
         ]
         
-        response = client.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-4-turbo-preview",
             messages=messages,
             max_tokens=150,
@@ -422,14 +419,14 @@ def handle_aspect_query(aspect, place, conversation_context):
                 "content": f"""
                 Aspect: {aspect}
                 Place details: {json.dumps(place)}
-                User preferences: {json.dumps(conversation_context.user_preferences)}
+                User preferences: {json.dumps(conversation_context.user_preferences, default=sorted)}
                 
                 Generate a natural response about this aspect of the place.
                 """
             }
         ]
         
-        response = client.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-4-turbo-preview",
             messages=messages,
             max_tokens=150,
@@ -1,13 +1,66 @@
 from pinecone import Pinecone
 import os
 from openai import OpenAI
-from geopy.distance import geodesic
 import logging
+import math
 import json
+from concurrent.futures import ThreadPoolExecutor
 from app import get_openai_client, get_pinecone_index
 
 logger = logging.getLogger(__name__)
 
+# Worker threads for embedding requests so the OpenAI round trip can overlap
+# with the CPU work of building search filters
+_embedding_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="embedding")
+
+# Bit assigned to each known atmosphere token so preference matching is a
+# single AND + popcount per match instead of building sets
+_ATMOSPHERE = {
+    'cozy': 1 << 0,
+    'romantic': 1 << 1,
+    'quiet': 1 << 2,
+    'casual': 1 << 3,
+    'outdoor': 1 << 4,
+    'family-friendly': 1 << 5,
+    'rooftop': 1 << 6,
+    'lively': 1 << 7,
+    'upscale': 1 << 8
+}
+
+# Mean Earth radius; haversine is within ~0.5% of the ellipsoidal geodesic,
+# plenty for ranking and "miles away" at city scale
+EARTH_RADIUS_MILES = 3958.8
+
+def haversine_miles(origin, destination):
+    """Great-circle distance in miles between two (lat, lon) pairs"""
+    lat1, lon1 = map(math.radians, origin)
+    lat2, lon2 = map(math.radians, destination)
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+# Price score by price_numeric: 1=1.0, 2=0.67, 3=0.33, 4=0.0 (0 treated as 1)
+_PRICE_SCORE = (1.0, 1.0, 2 / 3, 1 / 3, 0.0)
+
+def atmosphere_mask(atmosphere):
+    """Convert a list (or comma separated string) of atmosphere tokens to a bitmask"""
+    if not atmosphere:
+        return 0
+    if isinstance(atmosphere, str):
+        atmosphere = atmosphere.split(',')
+    mask = 0
+    for token in atmosphere:
+        mask |= _ATMOSPHERE.get(str(token).strip().lower(), 0)
+    return mask
+
+def _place_atmosphere_mask(metadata):
+    """Get the atmosphere bitmask for a place, preferring the precomputed value"""
+    if 'atmosphere_mask' in metadata:
+        try:
+            return int(metadata['atmosphere_mask'])
+        except (ValueError, TypeError):
+            pass
+    return atmosphere_mask(metadata.get('atmosphere'))
+
 def create_rich_query_text(query_info):
     """Create a rich search query text from the query info"""
     components = []
@@ -186,6 +239,8 @@ def create_search_filters(query_info):
 
 def calculate_result_scores(results, query_info):
     """Calculate comprehensive result scores based on multiple factors"""
+    feature_set = frozenset(f.lower() for f in query_info.get('features', []))
+    
     for result in results:
         # Base semantic similarity score (0-1)
         semantic_score = result.score
@@ -201,7 +256,7 @@ def calculate_result_scores(results, query_info):
         
         # Price score (0-1)
         price_numeric = int(result.metadata.get('price_numeric', 1))
-        price_score = 1 - ((price_numeric - 1) / 3)  # 1=1.0, 2=0.67, 3=0.33, 4=0.0
+        price_score = _PRICE_SCORE[min(max(price_numeric, 0), 4)]
         
         # Location relevance (0-1)
         location_score = 1.0
@@ -212,15 +267,15 @@ def calculate_result_scores(results, query_info):
                 float(result.metadata.get('longitude', 0))
             )
             if all(place_coords):
-                distance = geodesic(user_coords, place_coords).miles
+                distance = haversine_miles(user_coords, place_coords)
                 location_score = max(0, 1 - (distance / 10))  # Decay over 10 miles
         
         # Feature match score (0-1)
         feature_score = 1.0
-        if query_info.get('features'):
-            matched_features = sum(1 for f in query_info['features'] 
-                                 if f.lower() in result.metadata.get('about', '').lower())
-            feature_score = matched_features / len(query_info['features']) if query_info['features'] else 1.0
+        if feature_set:
+            about_lower = result.metadata.get('about', '').lower()
+            matched_features = sum(1 for f in feature_set if f in about_lower)
+            feature_score = matched_features / len(feature_set)
         
         # Combined weighted score
         result.combined_score = (
@@ -234,6 +289,13 @@ def calculate_result_scores(results, query_info):
 
 def search_places(query_info, top_k=5, excluded_ids=None, sort_by='best_match', limit=None):
     """Enhanced semantic search with better filtering and ranking"""
+    matches = fetch_candidate_matches(query_info, top_k, excluded_ids)
+    if not matches:
+        return []
+    return process_search_results(matches, query_info, sort_by, limit)
+
+def fetch_candidate_matches(query_info, top_k=5, excluded_ids=None):
+    """Query Pinecone for candidate matches, relaxing filters until something is found"""
     try:
         # Add excluded IDs to query info
         if excluded_ids:
@@ -243,16 +305,18 @@ def search_places(query_info, top_k=5, excluded_ids=None, sort_by='best_match',
         rich_query = create_rich_query_text(query_info)
         logger.info(f"🔍 Rich query: {rich_query}")
         
-        # Generate embedding
-        query_embedding = create_query_embedding(rich_query)
-        if not query_embedding:
-            logger.error("Failed to create query embedding")
-            return []
+        # Generate embedding in the background while the filters are built
+        embedding_future = _embedding_executor.submit(create_query_embedding, rich_query)
         
         # Create filters
         filters = create_search_filters(query_info)
         logger.info(f"🎯 Search filters: {json.dumps(filters, indent=2)}")
         
+        query_embedding = embedding_future.result()
+        if not query_embedding:
+            logger.error("Failed to create query embedding")
+            return []
+        
         # Perform search with relaxed filters first
         try:
             results = get_pinecone_index().query(
@@ -264,7 +328,7 @@ def search_places(query_info, top_k=5, excluded_ids=None, sort_by='best_match',
             
             if results and results.matches:
                 logger.info(f"Found {len(results.matches)} results with filters")
-                return process_search_results(results.matches, query_info, sort_by, limit)
+                return results.matches
                 
         except Exception as e:
             logger.error(f"Error in initial Pinecone search: {str(e)}")
@@ -283,7 +347,7 @@ def search_places(query_info, top_k=5, excluded_ids=None, sort_by='best_match',
             
             if results and results.matches:
                 logger.info(f"Found {len(results.matches)} results with relaxed filters")
-                return process_search_results(results.matches, query_info, sort_by, limit)
+                return results.matches
                 
         except Exception as e:
             logger.error(f"Error in relaxed Pinecone search: {str(e)}")
@@ -306,7 +370,7 @@ def search_places(query_info, top_k=5, excluded_ids=None, sort_by='best_match',
             
             if results and results.matches:
                 logger.info(f"Found {len(results.matches)} results with location filter only")
-                return process_search_results(results.matches, query_info, sort_by, limit)
+                return results.matches
                 
         except Exception as e:
             logger.error(f"Error in location-only Pinecone search: {str(e)}")
@@ -314,7 +378,7 @@ def search_places(query_info, top_k=5, excluded_ids=None, sort_by='best_match',
         return []
         
     except Exception as e:
-        logger.error(f"Error in search_places: {str(e)}")
+        logger.error(f"Error fetching candidate matches: {str(e)}")
         logger.exception("Full error traceback:")
         return []
 
@@ -333,6 +397,13 @@ def process_search_results(matches, query_info, sort_by='best_match', limit=None
     """
     try:
         processed_results = []
+        preferences = query_info.get('preferences', {})
+        user_atmosphere_mask = atmosphere_mask(preferences.get('atmosphere'))
+        
+        # Distance is only needed for distance sorting or when explicitly requested
+        user_coords = query_info.get('location', {}).get('coordinates')
+        need_distance = user_coords and (sort_by == 'distance' or query_info.get('include_distance', False))
+        
         for match in matches:
             # Calculate comprehensive score
             base_score = match.score
@@ -357,17 +428,15 @@ def process_search_results(matches, query_info, sort_by='best_match', limit=None
                     
             # Preference matching boost
             preference_boost = 0
-            preferences = query_info.get('preferences', {})
             
             # Check price level match
             if preferences.get('price_level') and match.metadata.get('price_level') == preferences['price_level']:
                 preference_boost += 0.1
                 
             # Check atmosphere match
-            if preferences.get('atmosphere') and match.metadata.get('atmosphere'):
-                user_atmosphere = set(preferences['atmosphere'])
-                place_atmosphere = set(match.metadata['atmosphere'])
-                atmosphere_match = len(user_atmosphere.intersection(place_atmosphere))
+            if user_atmosphere_mask:
+                place_mask = _place_atmosphere_mask(match.metadata)
+                atmosphere_match = bin(user_atmosphere_mask & place_mask).count('1')
                 preference_boost += atmosphere_match * 0.05
                 
             # Calculate final score
@@ -375,15 +444,14 @@ def process_search_results(matches, query_info, sort_by='best_match', limit=None
             
             # Calculate distance if coordinates are provided
             distance = None
-            if query_info.get('location', {}).get('coordinates'):
+            if need_distance:
                 try:
-                    user_coords = query_info['location']['coordinates']
                     place_coords = (
                         float(match.metadata.get('latitude', 0)),
                         float(match.metadata.get('longitude', 0))
                     )
                     if all(place_coords):
-                        distance = geodesic(user_coords, place_coords).miles
+                        distance = haversine_miles(user_coords, place_coords)
                 except (ValueError, TypeError):
                     pass
             
@@ -1,24 +1,162 @@
-from elevenlabs import generate as elevenlabs_generate
-from elevenlabs import set_api_key, voices, Voice
+from werkzeug.local import LocalProxy
+import httpx
 import os
+import sys
+import secrets
+import atexit
 import tempfile
+import hashlib
+import shutil
 import logging
 import random
+import time
 import datetime
 import concurrent.futures
+import functools
+import itertools
+import threading
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import json
+import orjson
+import queue
+import re
+from collections import OrderedDict, deque
+from contextvars import ContextVar
 
 logger = logging.getLogger(__name__)
 
-# Set ElevenLabs API key
-set_api_key(os.getenv('ELEVENLABS_API_KEY'))
-
 # Cache for available voices
 _available_voices = None
 
+# Audio directories: per-request files are served (and deleted) from
+# TEMP_AUDIO_DIR, synthesized chunks are kept in TTS_CACHE_DIR for reuse.
+# Set TRAVEX_AUDIO_DIR to a tmpfs path (e.g. /dev/shm/travex_audio) to keep
+# this short-lived audio off the disk; the cache stays on the same filesystem
+# so hand-outs can still be hardlinks
+TEMP_AUDIO_DIR = os.getenv('TRAVEX_AUDIO_DIR') or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'temp_audio')
+TTS_CACHE_DIR = os.path.join(TEMP_AUDIO_DIR, 'cache')
+# Turbo models (e.g. eleven_turbo_v2) return the first audio bytes much sooner
+TTS_MODEL = os.getenv('ELEVENLABS_MODEL', "eleven_monolingual_v1")
+os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+
+# Filtered voice list persisted across process starts; point VOICES_CACHE_PATH
+# at shared storage (e.g. /dev/shm) so every worker process reads the same copy
+VOICES_CACHE_PATH = os.getenv('VOICES_CACHE_PATH') or os.path.join(TEMP_AUDIO_DIR, 'voices_cache.json')
+VOICES_CACHE_TTL = 24 * 60 * 60
+
+# HTTP/2 client shared by all synthesis requests: TLS is negotiated once and
+# concurrent chunks are multiplexed over the same connection
+ELEVENLABS_TTS_URL = "https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream"
+# ElevenLabs optimize_streaming_latency level (0-4); higher trades quality for first-byte time
+TTS_STREAMING_LATENCY = os.getenv('TTS_STREAMING_LATENCY')
+# A stalled handshake fails fast, synthesis may stream for a while
+TTS_TIMEOUT = httpx.Timeout(30, connect=3.05)
+# Concurrent synthesis requests; default matches the ElevenLabs concurrent request limit
+TTS_CONCURRENCY = int(os.getenv('TTS_CONCURRENCY', '2'))
+_tts_client = httpx.Client(
+    http2=True,
+    timeout=TTS_TIMEOUT,
+    limits=httpx.Limits(max_connections=TTS_CONCURRENCY, max_keepalive_connections=TTS_CONCURRENCY),
+    headers={
+        'xi-api-key': os.getenv('ELEVENLABS_API_KEY') or '',
+        'Accept': 'audio/mpeg'
+    }
+)
+atexit.register(_tts_client.close)
+
+# Don't update access times on audio files we read and write (Linux only)
+_O_NOATIME = getattr(os, 'O_NOATIME', 0)
+
+# Chunks shorter than this aren't sent for synthesis
+MIN_SPOKEN_CHUNK = 10
+
+# Pause inserted between chunks synthesized in a single request
+CHUNK_BREAK = ' <break time="0.25s" /> '
+
+# Audio left in TEMP_AUDIO_DIR longer than this was never played and is swept
+TEMP_AUDIO_TTL = 300
+SWEEP_INTERVAL = 60
+
+# Size budget for TTS_CACHE_DIR; least recently used audio is evicted beyond it
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_MB', '512')) * 1024 * 1024
+
+# Cache key -> cached mp3 path
+_tts_cache = {}
+
+# Cache key -> Future of the synthesis currently producing it
+_tts_inflight = {}
+_tts_inflight_lock = threading.Lock()
+
+# Process-wide cap on in-flight synthesis requests, covering calls made outside
+# the executor too; 429s are retried a few times, honoring Retry-After
+_tts_slots = threading.BoundedSemaphore(TTS_CONCURRENCY)
+TTS_MAX_RETRIES = 3
+TTS_MAX_RETRY_DELAY = 10
+
+# Shared TTS workers, one keep-alive connection each
+_tts_executor = ThreadPoolExecutor(max_workers=TTS_CONCURRENCY, thread_name_prefix="tts")
+atexit.register(_tts_executor.shutdown, wait=False, cancel_futures=True)
+
+# Phrasebook pre-synthesis runs on its own single worker so live calls never
+# queue behind it; it holds at most one of the synthesis slots at a time
+_prewarm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-prewarm")
+atexit.register(_prewarm_executor.shutdown, wait=False, cancel_futures=True)
+
+def _compile_keywords(keywords):
+    """Compile substring keywords into a single alternation regex"""
+    return re.compile('|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)))
+
+# Interaction-style and context keywords, checked on every user turn
+_VERBOSE_RE = _compile_keywords(['tell me more', 'details', 'explain'])
+_BRIEF_RE = _compile_keywords(['quick', 'brief', 'just'])
+_DIRECT_RE = _compile_keywords(['exactly', 'specifically', 'precisely'])
+_EXPLORATORY_RE = _compile_keywords(['what else', 'other options', 'alternatives'])
+_CATEGORY_CHANGE_RE = _compile_keywords([
+    'instead', 'different', 'change', 'switch', 'looking for',
+    'want to find', 'search for', 'find me', 'show me'
+])
+_MAINTAIN_CONTEXT_RE = _compile_keywords([
+    'this', 'that', 'it', 'there', 'more about',
+    'tell me more', 'what about', 'how about'
+])
+
+_NAME_TOKEN_RE = re.compile(r"[\w']+")
+
+def _name_tokens(text):
+    """Lowercased words longer than three letters, used for partial name matching"""
+    return frozenset(word for word in _NAME_TOKEN_RE.findall(text.lower()) if len(word) > 3)
+
+def _tail(entries, count):
+    """Last count entries of a deque, oldest first, without copying the rest"""
+    return list(itertools.islice(reversed(entries), count))[::-1]
+
+def _intern_place_id(place_id):
+    """Intern string place IDs so every tracking set shares one object per place"""
+    return sys.intern(place_id) if type(place_id) is str else place_id
+
+# Per-call bounds so long calls don't grow memory without limit
+HISTORY_LIMIT = 64
+CONVERSATION_HISTORY_LIMIT = 256
+DISCUSSION_DEPTH_LIMIT = 200
+MENTIONED_PLACES_LIMIT = 200
+FLOW_HISTORY_LIMIT = 64
+TOPIC_HISTORY_LIMIT = 32
+RECENT_PLACES_LIMIT = 5
+
 class ConversationContext:
+    # One instance per active call; slots drop the per-instance __dict__
+    __slots__ = (
+        'current_city', 'current_category', 'current_place', 'current_results', 'remaining_results',
+        'shown_places', 'rejected_places', 'preferred_places', 'mentioned_places', 'place_name_map',
+        '_place_name_pattern', 'last_mentioned_places', 'discussion_depth', 'category_history',
+        'conversation_history', 'previous_queries', 'previous_responses', 'query_count', 'user_preferences',
+        'call_start_time', 'last_interaction_time', 'conversation_flow', 'user_interests', 'rejected_topics',
+        'interaction_style', 'search_history', 'current_topic', 'topic_history', 'last_action',
+        'pending_questions', 'current_voice', 'interrupted', 'last_query_type', 'last_response',
+        'last_response_key', 'last_response_paths'
+    )
+    
     def __init__(self):
         """Initialize conversation context with proper data structures"""
         # Basic tracking
@@ -26,21 +164,23 @@ class ConversationContext:
         self.current_category = None
         self.current_place = None
         self.current_results = []
-        self.remaining_results = []
-        self.current_search_index = 0
+        self.remaining_results = deque()
         
         # Result tracking
         self.shown_places = set()
         self.rejected_places = set()
         self.preferred_places = set()
-        self.mentioned_places = set()
+        self.mentioned_places = OrderedDict()  # place_id -> place name (LRU-capped)
         self.place_name_map = {}
         
         # Context tracking
-        self.last_mentioned_places = []
-        self.discussion_depth = {}
+        self.last_mentioned_places = deque(maxlen=RECENT_PLACES_LIMIT)
+        self.discussion_depth = OrderedDict()
         self.category_history = []
-        self.conversation_history = []
+        self.conversation_history = deque(maxlen=CONVERSATION_HISTORY_LIMIT)
+        self.previous_queries = deque(maxlen=HISTORY_LIMIT)
+        self.previous_responses = deque(maxlen=HISTORY_LIMIT)
+        self.query_count = 0
         self.user_preferences = {}
         
         # Timestamps
@@ -48,15 +188,16 @@ class ConversationContext:
         self.last_interaction_time = datetime.datetime.now()
         
         # Enhanced conversation tracking
-        self.conversation_flow = []  # Track conversation flow and transitions
+        self.conversation_flow = deque(maxlen=FLOW_HISTORY_LIMIT)  # Track conversation flow and transitions
         
         # Place and category tracking
         self.current_place = None  # Currently being discussed place
         self.current_category = None  # Current category (hotel, restaurant, etc.)
         self.category_history = []  # Track category changes
-        self.last_mentioned_places = []  # List of recently mentioned places in order
-        self.discussion_depth = {}  # Track how much we've discussed each place
+        self.last_mentioned_places = deque(maxlen=RECENT_PLACES_LIMIT)  # Recently mentioned places, newest first
+        self.discussion_depth = OrderedDict()  # Track how much we've discussed each place (LRU-capped)
         self.place_name_map = {}  # Map place names to IDs
+        self._place_name_pattern = None  # Compiled from place_name_map on demand
         
         # User understanding
         self.user_interests = set()  # Track what the user seems interested in
@@ -68,34 +209,55 @@ class ConversationContext:
         }
         
         # Search management
-        self.search_history = []  # Track search queries and their results
+        self.search_history = deque(maxlen=HISTORY_LIMIT)  # Track search queries and their results
         self.current_topic = None  # Current topic of conversation
-        self.topic_history = []  # Track topic changes
+        self.topic_history = deque(maxlen=TOPIC_HISTORY_LIMIT)  # Track topic changes
         self.last_action = None  # Last action taken
         self.pending_questions = []  # Questions we haven't answered yet
         
+        # Per-call voice and turn state
+        self.current_voice = None
+        self.interrupted = False
+        self.last_query_type = None
+        
+        # Last synthesized response, for replaying repeats
+        self.last_response = None
+        self.last_response_key = None
+        self.last_response_paths = []
+        
+    def start_new_call(self):
+        """Reset per-call history and preferences at the start of a call"""
+        self.conversation_history = deque(maxlen=CONVERSATION_HISTORY_LIMIT)
+        self.call_start_time = datetime.datetime.now()
+        self.previous_queries = deque(maxlen=HISTORY_LIMIT)
+        self.previous_responses = deque(maxlen=HISTORY_LIMIT)
+        self.query_count = 0
+        self.mentioned_places = OrderedDict()
+        self.user_preferences = {}
+        self.current_voice = None
+        
     def update_interaction_style(self, query, response_type):
         """Learn user's preferred interaction style"""
         query_lower = query.lower()
         
         # Check for verbosity preference
-        if any(phrase in query_lower for phrase in ['tell me more', 'details', 'explain']):
+        if _VERBOSE_RE.search(query_lower):
             self.interaction_style['verbose'] = True
-        elif any(phrase in query_lower for phrase in ['quick', 'brief', 'just']):
+        elif _BRIEF_RE.search(query_lower):
             self.interaction_style['verbose'] = False
             
         # Check for directness preference
-        if any(phrase in query_lower for phrase in ['exactly', 'specifically', 'precisely']):
+        if _DIRECT_RE.search(query_lower):
             self.interaction_style['direct'] = True
             
         # Check for exploratory nature
-        if any(phrase in query_lower for phrase in ['what else', 'other options', 'alternatives']):
+        if _EXPLORATORY_RE.search(query_lower):
             self.interaction_style['exploratory'] = True
             
     def add_to_conversation_flow(self, query, response_type, action_taken):
         """Track conversation flow for better context understanding"""
         self.conversation_flow.append({
-            'timestamp': datetime.datetime.now(),
+            'ts_ns': time.monotonic_ns(),
             'query': query,
             'response_type': response_type,
             'action_taken': action_taken,
@@ -116,27 +278,16 @@ class ConversationContext:
             if last_interaction['action_taken'] == 'get_place_details':
                 return True
                 
-        # Keywords that suggest category change
-        category_change_keywords = [
-            'instead', 'different', 'change', 'switch', 'looking for',
-            'want to find', 'search for', 'find me', 'show me'
-        ]
-        
         # If query contains explicit category changes, don't maintain
-        if any(keyword in query_lower for keyword in category_change_keywords):
+        if _CATEGORY_CHANGE_RE.search(query_lower):
             return False
-            
-        # Keywords that suggest maintaining context
-        maintain_context_keywords = [
-            'this', 'that', 'it', 'there', 'more about',
-            'tell me more', 'what about', 'how about'
-        ]
         
         # Consider intent analysis confidence
         if intent_analysis and intent_analysis.get('should_maintain_context'):
             return True
-            
-        return any(keyword in query_lower for keyword in maintain_context_keywords)
+        
+        # Keywords that suggest maintaining context
+        return _MAINTAIN_CONTEXT_RE.search(query_lower) is not None
         
     def update_topic(self, new_topic):
         """Update conversation topic with history tracking"""
@@ -144,7 +295,7 @@ class ConversationContext:
             self.topic_history.append({
                 'from_topic': self.current_topic,
                 'to_topic': new_topic,
-                'timestamp': datetime.datetime.now()
+                'ts_ns': time.monotonic_ns()
             })
             self.current_topic = new_topic
             
@@ -157,8 +308,8 @@ class ConversationContext:
             'current_topic': self.current_topic,
             'interaction_style': self.interaction_style,
             'user_preferences': self.user_preferences,
-            'conversation_flow': self.conversation_flow[-3:] if self.conversation_flow else [],
-            'topic_history': self.topic_history[-3:] if self.topic_history else []
+            'conversation_flow': _tail(self.conversation_flow, 3),
+            'topic_history': _tail(self.topic_history, 3)
         }
     
     def add_search_results(self, results, query_info):
@@ -167,33 +318,37 @@ class ConversationContext:
             if not results:
                 return []
                 
-            processed_results = []
-            for result in results:
-                # Handle both dictionary and object formats
-                if isinstance(result, dict):
-                    processed_result = result
-                else:
-                    processed_result = {
-                        'id': result.id,
-                        'metadata': result.metadata,
-                        'score': getattr(result, 'score', 0)
-                    }
-                processed_results.append(processed_result)
+            # Handle both dictionary and object formats
+            processed_results = [
+                result if isinstance(result, dict) else {
+                    'id': result.id,
+                    'metadata': result.metadata,
+                    'score': getattr(result, 'score', 0)
+                }
+                for result in results
+            ]
+            
+            # Parse JSON metadata and tokenize titles once here rather than on every turn
+            for result in processed_results:
+                if isinstance(result.get('metadata'), dict):
+                    parse_place_metadata(result['metadata'])
+                    result['_title_tokens'] = _name_tokens(result['metadata'].get('title', ''))
             
             # Store the first three results for immediate use
             self.current_results = processed_results[:3]
             
             # Store remaining results for future reference
-            self.remaining_results = processed_results[3:]
-            
-            # Reset search index
-            self.current_search_index = 0
+            self.remaining_results = deque(processed_results[3:])
             
             # Update place tracking
             for result in self.current_results:
-                self.mentioned_places.add(result['id'])
-                if result.get('metadata', {}).get('title'):
-                    self.place_name_map[result['metadata']['title'].lower()] = result['id']
+                self.remember_place(result['id'], result.get('metadata', {}).get('title'))
+            self.place_name_map.update(
+                (title.lower(), result['id'])
+                for result in self.current_results
+                if (title := result.get('metadata', {}).get('title'))
+            )
+            self._place_name_pattern = None
             
             # Set the first result as current place
             if self.current_results:
@@ -218,36 +373,47 @@ class ConversationContext:
         """Get next batch of results, ensuring we don't repeat places"""
         if not self.remaining_results:
             return []
-            
-        start_idx = self.current_search_index
-        end_idx = start_idx + count
-        results = self.remaining_results[start_idx:end_idx]
-        self.current_search_index = end_idx
         
-        # Track these places as shown
-        for result in results:
-            self.shown_places.add(result['id'])
+        # Consume from the front, skipping places already shown or rejected
+        results = []
+        while self.remaining_results and len(results) < count:
+            result = self.remaining_results.popleft()
+            place_id = _intern_place_id(result['id'])
+            if place_id in self.shown_places or place_id in self.rejected_places:
+                continue
+            results.append(result)
+            
+            # Track this place as shown
+            self.shown_places.add(place_id)
             
         return results
     
+    def remember_place(self, place_id, place_name):
+        """Record a mentioned place, evicting the least recently mentioned past the cap"""
+        place_id = _intern_place_id(place_id)
+        self.mentioned_places[place_id] = place_name
+        self.mentioned_places.move_to_end(place_id)
+        if len(self.mentioned_places) > MENTIONED_PLACES_LIMIT:
+            self.mentioned_places.popitem(last=False)
+    
     def mark_place_rejected(self, place_id):
         """Mark a place as rejected by the user"""
+        place_id = _intern_place_id(place_id)
         self.rejected_places.add(place_id)
-        if place_id in self.preferred_places:
-            self.preferred_places.remove(place_id)
+        self.preferred_places.discard(place_id)
     
     def mark_place_preferred(self, place_id):
         """Mark a place as preferred by the user"""
+        place_id = _intern_place_id(place_id)
         self.preferred_places.add(place_id)
-        if place_id in self.rejected_places:
-            self.rejected_places.remove(place_id)
+        self.rejected_places.discard(place_id)
     
     def set_current_place(self, place_id, place_metadata):
         """Set the currently discussed place and update context"""
         self.current_place = {
             'id': place_id,
             'metadata': place_metadata,
-            'first_mentioned': datetime.datetime.now(),
+            'first_mentioned_ns': time.monotonic_ns(),
             'mentioned_count': self.discussion_depth.get(place_id, 0) + 1
         }
         # Update category tracking
@@ -255,19 +421,27 @@ class ConversationContext:
             self.current_category = place_metadata['category']
             self.category_history.append({
                 'category': place_metadata['category'],
-                'timestamp': datetime.datetime.now()
+                'ts_ns': time.monotonic_ns()
             })
         
         self.discussion_depth[place_id] = self.discussion_depth.get(place_id, 0) + 1
-        self.shown_places.add(place_id)
+        self.discussion_depth.move_to_end(place_id)
+        if len(self.discussion_depth) > DISCUSSION_DEPTH_LIMIT:
+            self.discussion_depth.popitem(last=False)
+        self.shown_places.add(_intern_place_id(place_id))
         
-        if place_id not in [p['id'] for p in self.last_mentioned_places]:
-            self.last_mentioned_places.insert(0, {
+        if not any(p['id'] == place_id for p in self.last_mentioned_places):
+            self.last_mentioned_places.appendleft({
                 'id': place_id,
                 'metadata': place_metadata,
-                'timestamp': datetime.datetime.now()
+                'ts_ns': time.monotonic_ns()
             })
-            self.last_mentioned_places = self.last_mentioned_places[:5]
+    
+    def get_place_name_pattern(self):
+        """Regex matching any known place name, rebuilt only after the name map changes"""
+        if self._place_name_pattern is None and self.place_name_map:
+            self._place_name_pattern = _compile_keywords(self.place_name_map)
+        return self._place_name_pattern
     
     def get_current_category(self):
         """Get the current category being discussed"""
@@ -287,34 +461,134 @@ class ConversationContext:
                 return place
                 
         return None
+    
+    def handle_place_reference(self, speech_result):
+        """Handle references to previously mentioned places"""
+        try:
+            speech_lower = speech_result.lower()
+            logger.info(f"\n=== Processing Place Reference ===")
+            logger.info(f"🎯 Input speech: '{speech_lower}'")
+        
+            logger.info(f"🔍 Checking against {len(_REFERENCE_KEYWORDS)} reference patterns")
+        
+            # Check if they're referring to the current place
+            if self.current_place and isinstance(self.current_place, dict):
+                current_title = self.current_place.get('metadata', {}).get('title', '').lower()
+                logger.info(f"📍 Current place in context: '{current_title}'")
+            
+                if current_title and (current_title in speech_lower or 
+                    any(word in current_title for word in speech_lower.split() if len(word) > 3)):
+                    logger.info(f"✅ Matched current place reference: {current_title}")
+                    return self.current_place.get('id')
+            else:
+                logger.info("ℹ️ No current place in context")
+        
+            # Check for ordinal references in current results
+            if self.current_results:
+                logger.info(f"🔢 Checking ordinal references against {len(self.current_results)} current results")
+                found_ordinals = set(_ORDINAL_RE.findall(speech_lower))
+                for ordinal, index in _ORDINAL_MAPPING:
+                    if ordinal in found_ordinals:
+                        logger.info(f"📊 Found ordinal reference: '{ordinal}' (index: {index})")
+                        if index == -1:
+                            index = len(self.current_results) - 1
+                        if 0 <= index < len(self.current_results):
+                            result = self.current_results[index]
+                            if isinstance(result, dict):
+                                title = result.get('metadata', {}).get('title', '')
+                                logger.info(f"✅ Matched ordinal reference to: {title}")
+                                self.set_current_place(result.get('id'), result.get('metadata', {}))
+                                return result.get('id')
+            else:
+                logger.info("ℹ️ No current results to check ordinal references against")
+        
+            # Check for partial name matches in all results
+            speech_words = _name_tokens(speech_lower)
+            all_results = [*self.current_results, *self.remaining_results]
+        
+            if speech_words:
+                logger.info(f"🔤 Checking partial name matches with words: {sorted(speech_words)}")
+            
+                for result in all_results:
+                    if isinstance(result, dict) and not speech_words.isdisjoint(result.get('_title_tokens', ())):
+                        title = result.get('metadata', {}).get('title', '').lower()
+                        logger.info(f"✅ Found partial name match: '{title}'")
+                        self.set_current_place(result.get('id'), result.get('metadata', {}))
+                        return result.get('id')
+        
+            # Check place name map for exact matches
+            name_pattern = self.get_place_name_pattern()
+            if name_pattern:
+                logger.info(f"📚 Checking exact matches in place name map ({len(self.place_name_map)} entries)")
+                for match in name_pattern.finditer(speech_lower):
+                    name = match.group()
+                    place_id = self.place_name_map[name]
+                    logger.info(f"✅ Found exact name match: '{name}'")
+                    for result in all_results:
+                        if isinstance(result, dict) and result.get('id') == place_id:
+                            self.set_current_place(result.get('id'), result.get('metadata', {}))
+                            return place_id
+        
+            logger.info("❌ No place reference found in speech")
+            return None
+        
+        except Exception as e:
+            logger.error(f"❌ Error handling place reference: {str(e)}")
+            logger.exception("Full error traceback:")
+            return None
 
-# Global conversation context
-conversation_context = ConversationContext()
+# Per-call conversation state. Each webhook request binds the context for its
+# Twilio CallSid; code running outside a call shares a default context
+MAX_ACTIVE_CALLS = 256
+_default_context = ConversationContext()
+_call_contexts = OrderedDict()
+_call_contexts_lock = threading.Lock()
+_current_context = ContextVar('conversation_context', default=_default_context)
+
+def bind_call_context(call_sid):
+    """Make the context for call_sid current for this request, creating it if new"""
+    if not call_sid:
+        context = _default_context
+    else:
+        with _call_contexts_lock:
+            context = _call_contexts.get(call_sid)
+            if context is None:
+                context = _call_contexts[call_sid] = ConversationContext()
+                if len(_call_contexts) > MAX_ACTIVE_CALLS:
+                    _call_contexts.popitem(last=False)
+            else:
+                _call_contexts.move_to_end(call_sid)
+    _current_context.set(context)
+    return context
+
+def get_ctx():
+    """Get the conversation context of the current call"""
+    return _current_context.get()
+
+# Proxy to the current call's context, for callers that import it by name
+conversation_context = LocalProxy(_current_context)
 
 def initialize_voices():
     """Initialize and cache available ElevenLabs voices"""
     global _available_voices
     try:
-        logger.info("🎙️ Initializing ElevenLabs voices...")
-        all_voices = voices()
-        if not all_voices:
-            logger.error("❌ No voices found in ElevenLabs account")
-            return False
-            
-        # Filter out test voices and cache the production ones
-        _available_voices = [
-            {
-                'id': voice.voice_id,
-                'name': voice.name,
-                'category': getattr(voice, 'category', 'general'),
-                'description': getattr(voice, 'description', '')
-            }
-            for voice in all_voices
-            if not voice.name.lower().startswith('test')
-        ]
+        cached = _load_cached_voices()
+        if cached:
+            _available_voices = cached
+            logger.info(f"✅ Loaded {len(cached)} voices from cache")
+        else:
+            _available_voices = _fetch_voices()
+            if not _available_voices:
+                return False
+        
+        if os.getenv('TTS_PREWARM_PHRASEBOOK', '').lower() in ('1', 'true', 'yes'):
+            prewarm_phrasebook([v['id'] for v in _available_voices])
         
-        voice_names = [v['name'] for v in _available_voices]
-        logger.info(f"✅ Successfully initialized {len(_available_voices)} voices: {', '.join(voice_names)}")
+        # Have the fallback audio cached before the first failure needs it
+        for error_message in (NO_AUDIO_ERROR_MESSAGE, SPEECH_ERROR_MESSAGE):
+            submit_error_audio(error_message).add_done_callback(
+                lambda future: cleanup_audio_file(future.result())
+            )
         return True
         
     except Exception as e:
@@ -322,6 +596,60 @@ def initialize_voices():
         logger.exception("Full error traceback:")
         return False
 
+def _fetch_voices():
+    """Fetch production voices from ElevenLabs and persist them to the cache"""
+    logger.info("🎙️ Initializing ElevenLabs voices...")
+    # The SDK is only used to list voices, so it is loaded on a cache miss
+    from elevenlabs import set_api_key, voices
+    set_api_key(os.getenv('ELEVENLABS_API_KEY'))
+    all_voices = voices()
+    if not all_voices:
+        logger.error("❌ No voices found in ElevenLabs account")
+        return None
+        
+    # Filter out test voices and cache the production ones
+    voice_list = [
+        {
+            'id': voice.voice_id,
+            'name': voice.name,
+            'category': getattr(voice, 'category', 'general'),
+            'description': getattr(voice, 'description', '')
+        }
+        for voice in all_voices
+        if not voice.name.lower().startswith('test')
+    ]
+    
+    voice_names = [v['name'] for v in voice_list]
+    logger.info(f"✅ Successfully initialized {len(voice_list)} voices: {', '.join(voice_names)}")
+    _save_cached_voices(voice_list)
+    return voice_list
+
+def _load_cached_voices():
+    """Load the voice list saved by a previous process if it hasn't expired"""
+    try:
+        with open(VOICES_CACHE_PATH) as f:
+            data = json.load(f)
+        if time.time() - data['ts'] < VOICES_CACHE_TTL:
+            return data['voices']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+def _save_cached_voices(voice_list):
+    """Persist the filtered voice list for later process starts"""
+    tmp_path = f"{VOICES_CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump({'ts': time.time(), 'voices': voice_list}, f)
+        # Readers in other workers never see a half-written file
+        os.replace(tmp_path, VOICES_CACHE_PATH)
+    except OSError as e:
+        logger.warning(f"Could not write voices cache: {str(e)}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
 def get_available_voices():
     """Get the list of available voices, initializing if necessary"""
     global _available_voices
@@ -331,12 +659,13 @@ def get_available_voices():
 
 def select_random_voice():
     """Select a random voice from available ElevenLabs voices"""
+    context = get_ctx()
     try:
         available = get_available_voices()
         if not available:
             logger.warning("No ElevenLabs voices found, using fallback voice")
             # Set a basic fallback voice in the context
-            conversation_context.current_voice = {
+            context.current_voice = {
                 'id': "ErXwobaYiN019PkySvjV",  # Antoni voice ID
                 'name': "Antoni"
             }
@@ -347,7 +676,7 @@ def select_random_voice():
         logger.info(f"Selected voice: {selected['name']} ({selected['id']})")
         
         # Store in conversation context
-        conversation_context.current_voice = {
+        context.current_voice = {
             'id': selected['id'],
             'name': selected['name']
         }
@@ -358,68 +687,96 @@ def select_random_voice():
         logger.error(f"❌ Error selecting voice: {str(e)}")
         logger.exception("Full error traceback:")
         # Fallback to Antoni
-        conversation_context.current_voice = {
+        context.current_voice = {
             'id': "ErXwobaYiN019PkySvjV",
             'name': "Antoni"
         }
         return "ErXwobaYiN019PkySvjV"
 
-def chunk_response(text, chunk_size=75):
+# One sentence per match: the '. ' delimiter is consumed, the last sentence keeps its own punctuation
+_SENTENCE_RE = re.compile(r'\s*(\S.*?)\s*(?:\.\s+|$)', re.DOTALL)
+
+def _join_sentences(sentences):
+    """Rejoin split sentences, keeping the last one's own end punctuation"""
+    joined = '. '.join(sentences)
+    return joined if joined[-1] in '.!?' else joined + '.'
+
+def chunk_response(text, chunk_size=75, min_chunk_size=15):
     """Break long responses into smaller, interruptible chunks"""
     # Use smaller chunks for faster generation
-    sentences = text.split('. ')
+    sentences = _SENTENCE_RE.findall(text)
+    lengths = [len(sentence) for sentence in sentences]
     chunks = []
-    current_chunk = []
+    start = 0
     current_length = 0
     
-    for sentence in sentences:
-        # Clean and normalize the sentence
-        sentence = sentence.strip()
-        if not sentence:
-            continue
-            
-        # If this sentence would make the chunk too long, save current chunk
-        if current_length + len(sentence) > chunk_size and current_chunk:
-            chunks.append('. '.join(current_chunk) + '.')
-            current_chunk = []
+    for end, length in enumerate(lengths):
+        # If this sentence would make the chunk too long, save current chunk,
+        # unless it is still too short to be worth its own request
+        if current_length + length > chunk_size and current_length >= min_chunk_size:
+            chunks.append(_join_sentences(sentences[start:end]))
+            start = end
             current_length = 0
-            
-        current_chunk.append(sentence)
-        current_length += len(sentence)
+        current_length += length
     
-    # Add any remaining sentences
-    if current_chunk:
-        chunks.append('. '.join(current_chunk) + '.')
+    # Add any remaining sentences, folding a short tail into the previous chunk
+    if start < len(sentences):
+        tail = _join_sentences(sentences[start:])
+        if current_length < min_chunk_size and chunks:
+            chunks[-1] = f"{chunks[-1]} {tail}"
+        else:
+            chunks.append(tail)
     
-    # Ensure chunks aren't too small but also not too large
-    return [chunk for chunk in chunks if 15 <= len(chunk) <= 100]
+    return chunks
+
+_GREETINGS = (
+    "Hi! I'm your local guide. Which city can I help you explore?",
+    "Hello! I'm here to help you discover great places. What city are you interested in?",
+    "Welcome! I'm your personal local guide. Which city would you like to explore?"
+)
+
+_SEARCH_ACKNOWLEDGMENTS = (
+    "Just a moment while I find the perfect places for you...",
+    "Let me search for some great options...",
+    "I'll help you find exactly what you're looking for..."
+)
 
 def get_initial_greeting():
     """Generate initial greeting with personality"""
-    greetings = [
-        "Hi! I'm your local guide. Which city can I help you explore?",
-        "Hello! I'm here to help you discover great places. What city are you interested in?",
-        "Welcome! I'm your personal local guide. Which city would you like to explore?"
-    ]
-    return random.choice(greetings)
+    return random.choice(_GREETINGS)
 
-def get_location_confirmation(city, state=None):
-    """Generate location confirmation with personality"""
-    responses = [
+@functools.lru_cache(maxsize=256)
+def _location_confirmations(city):
+    """Format the location confirmation options for a city once"""
+    return (
         f"Great! I know {city} very well. What type of place are you looking for?",
         f"Excellent choice! I love {city}. What would you like to discover?",
         f"Perfect! I can help you find the best places in {city}. What interests you?"
-    ]
-    return random.choice(responses)
+    )
+
+def get_location_confirmation(city, state=None):
+    """Generate location confirmation with personality"""
+    return random.choice(_location_confirmations(city))
 
 def get_search_acknowledgment():
     """Generate search acknowledgment with personality"""
-    responses = [
-        "Just a moment while I find the perfect places for you...",
-        "Let me search for some great options...",
-        "I'll help you find exactly what you're looking for..."
-    ]
-    return random.choice(responses)
+    return random.choice(_SEARCH_ACKNOWLEDGMENTS)
+
+_OUTDOOR_PLACE_TYPES = frozenset(('trail', 'park', 'hiking trail', 'outdoor recreation'))
+_OUTDOOR_AMENITIES = frozenset(('parking', 'restrooms', 'water fountain', 'playground', 'picnic area'))
+# Comma-separated feature strings, with the whitespace around each comma dropped
+_FEATURE_SPLIT_RE = re.compile(r'\s*,\s*')
+
+def _rating_phrase(rating):
+    """Describe a rating in words, or None when it isn't worth mentioning"""
+    if not rating:
+        return None
+    rating = float(rating)
+    if rating >= 4.5:
+        return "highly rated"
+    if rating >= 4.0:
+        return "well rated"
+    return None
 
 def format_place_results(results, conversation_context=None):
     """Format place results into natural conversation"""
@@ -431,7 +788,7 @@ def format_place_results(results, conversation_context=None):
         place_type = results[0]['metadata'].get('category', 'place').lower()
         
         # Special handling for outdoor/trail results
-        if place_type in ['trail', 'park', 'hiking trail', 'outdoor recreation']:
+        if place_type in _OUTDOOR_PLACE_TYPES:
             intro = "I found some great outdoor spots that might be perfect for you"
             if conversation_context and conversation_context.has_family_context():
                 intro += " and your family"
@@ -439,25 +796,26 @@ def format_place_results(results, conversation_context=None):
             
             details = []
             for result in results[:3]:
-                place_info = []
-                place_info.append(result['metadata'].get('title', 'this place'))
+                metadata = result['metadata']
+                place_info = [metadata.get('title', 'this place')]
                 
                 # Add difficulty level if available
-                if 'difficulty' in result['metadata']:
-                    place_info.append(f"it's a {result['metadata']['difficulty']} trail")
+                difficulty = metadata.get('difficulty')
+                if difficulty is not None:
+                    place_info.append(f"it's a {difficulty} trail")
                 
                 # Add length if available
-                if 'length' in result['metadata']:
-                    place_info.append(f"about {result['metadata']['length']} long")
+                length = metadata.get('length')
+                if length is not None:
+                    place_info.append(f"about {length} long")
                 
                 # Add key features
                 features = []
-                if result['metadata'].get('features'):
-                    feature_list = result['metadata']['features']
+                feature_list = metadata.get('features')
+                if feature_list:
                     if isinstance(feature_list, str):
-                        feature_list = feature_list.split(',')
-                    important_features = [f for f in feature_list if f.lower() in 
-                        ['parking', 'restrooms', 'water fountain', 'playground', 'picnic area']]
+                        feature_list = _FEATURE_SPLIT_RE.split(feature_list.strip())
+                    important_features = [f for f in feature_list if f.lower() in _OUTDOOR_AMENITIES]
                     if important_features:
                         features.extend(important_features)
                 
@@ -465,12 +823,9 @@ def format_place_results(results, conversation_context=None):
                     place_info.append(f"with {', '.join(features)}")
                 
                 # Add rating
-                if result['metadata'].get('rating'):
-                    rating = float(result['metadata']['rating'])
-                    if rating >= 4.5:
-                        place_info.append("highly rated by visitors")
-                    elif rating >= 4.0:
-                        place_info.append("well rated by visitors")
+                rating_phrase = _rating_phrase(metadata.get('rating'))
+                if rating_phrase:
+                    place_info.append(f"{rating_phrase} by visitors")
                 
                 details.append(". ".join(place_info))
             
@@ -488,23 +843,21 @@ def format_place_results(results, conversation_context=None):
         intro = f"I found some great {place_type}s that you might like. "
         details = []
         for result in results[:3]:
-            place_info = []
-            place_info.append(result['metadata'].get('title', 'this place'))
+            metadata = result['metadata']
+            place_info = [metadata.get('title', 'this place')]
             
-            if result['metadata'].get('price_level'):
-                place_info.append(f"it's {result['metadata']['price_level']} priced")
+            price_level = metadata.get('price_level')
+            if price_level:
+                place_info.append(f"it's {price_level} priced")
             
-            if result['metadata'].get('rating'):
-                rating = float(result['metadata']['rating'])
-                if rating >= 4.5:
-                    place_info.append("highly rated")
-                elif rating >= 4.0:
-                    place_info.append("well rated")
+            rating_phrase = _rating_phrase(metadata.get('rating'))
+            if rating_phrase:
+                place_info.append(rating_phrase)
             
-            if result['metadata'].get('features'):
-                features = result['metadata']['features']
+            features = metadata.get('features')
+            if features:
                 if isinstance(features, str):
-                    features = features.split(',')
+                    features = _FEATURE_SPLIT_RE.split(features.strip())
                 top_features = features[:2]
                 if top_features:
                     place_info.append(f"featuring {', '.join(top_features)}")
@@ -520,46 +873,74 @@ def format_place_results(results, conversation_context=None):
         logger.error(f"Error formatting place results: {str(e)}")
         return "I found some places that match your criteria. Would you like me to tell you about them?"
 
+_DETAILS_KEY_TYPES = (str, int, float, bool, tuple, type(None))
+# Raw JSON fields replaced by their *_parsed forms in the cache key
+_RAW_JSON_FIELDS = frozenset(('hours', 'about'))
+
+def parse_place_metadata(place_metadata):
+    """Parse the JSON hours/about fields once, storing hashable *_parsed forms"""
+    if 'hours_parsed' not in place_metadata:
+        try:
+            hours = orjson.loads(place_metadata['hours']) if place_metadata.get('hours') else {}
+            place_metadata['hours_parsed'] = tuple((day, str(times)) for day, times in hours.items())
+        except (ValueError, TypeError, AttributeError):
+            place_metadata['hours_parsed'] = ()
+    if 'about_parsed' not in place_metadata:
+        try:
+            about = orjson.loads(place_metadata['about']) if place_metadata.get('about') else []
+            place_metadata['about_parsed'] = tuple(
+                feature.get('name', '') for feature in about if feature.get('enabled', True)
+            )
+        except (ValueError, TypeError, AttributeError):
+            place_metadata['about_parsed'] = ()
+    return place_metadata
+
 def format_place_details(place_metadata):
     """Format detailed place information conversationally"""
+    parse_place_metadata(place_metadata)
+    # Only today's hours are spoken, so the day is part of the cache key
+    frozen_metadata = tuple(sorted(
+        (key, value) for key, value in place_metadata.items()
+        if key not in _RAW_JSON_FIELDS and isinstance(value, _DETAILS_KEY_TYPES)
+    ))
+    return _format_place_details_cached(frozen_metadata, datetime.datetime.now().strftime('%A'))
+
+@functools.lru_cache(maxsize=4096)
+def _format_place_details_cached(frozen_metadata, today):
+    """Build the details text for one place; repeat mentions are served from cache"""
+    place_metadata = dict(frozen_metadata)
     response = []
     
     # Basic information
     response.append(f"Let me tell you more about {place_metadata.get('title')}. ")
     
     # Location and contact
-    if place_metadata.get('address'):
-        response.append(f"It's located at {place_metadata['address']}. ")
-    if place_metadata.get('phone'):
-        response.append(f"You can reach them at {place_metadata['phone']}. ")
+    address = place_metadata.get('address')
+    if address:
+        response.append(f"It's located at {address}. ")
+    phone = place_metadata.get('phone')
+    if phone:
+        response.append(f"You can reach them at {phone}. ")
     
     # Hours
-    if place_metadata.get('hours'):
-        try:
-            hours = json.loads(place_metadata['hours'])
-            today = datetime.now().strftime('%A')
-            if today in hours:
-                response.append(f"Today they're open {hours[today]}. ")
-        except:
-            pass
+    hours = dict(place_metadata['hours_parsed'])
+    if today in hours:
+        response.append(f"Today they're open {hours[today]}. ")
     
     # Features and amenities
-    if place_metadata.get('about'):
-        try:
-            about = json.loads(place_metadata['about'])
-            features = [feature for feature in about if feature.get('enabled', True)]
-            if features:
-                response.append("Some notable features include: ")
-                response.append(", ".join(f.get('name', '') for f in features[:3]))
-                response.append(". ")
-        except:
-            pass
+    features = place_metadata['about_parsed']
+    if features:
+        response.append("Some notable features include: ")
+        response.append(", ".join(features[:3]))
+        response.append(". ")
     
     # Reviews and rating
-    if place_metadata.get('rating') and place_metadata.get('review_count'):
+    rating = place_metadata.get('rating')
+    review_count = place_metadata.get('review_count')
+    if rating and review_count:
         response.append(
-            f"It has {place_metadata['rating']} stars based on "
-            f"{place_metadata['review_count']} reviews. "
+            f"It has {rating} stars based on "
+            f"{review_count} reviews. "
         )
     
     # Add call to action
@@ -570,319 +951,544 @@ def format_place_details(place_metadata):
     
     return "".join(response)
 
+_FAREWELLS = (
+    "It was great helping you today! Feel free to ask me about any other places you'd like to discover.",
+    "I enjoyed being your guide! Don't hesitate to ask if you need more recommendations.",
+    "Thanks for letting me help! I'm always here when you need to find great places to visit."
+)
+
 def handle_farewell():
     """Generate farewell message"""
-    farewells = [
-        "It was great helping you today! Feel free to ask me about any other places you'd like to discover.",
-        "I enjoyed being your guide! Don't hesitate to ask if you need more recommendations.",
-        "Thanks for letting me help! I'm always here when you need to find great places to visit."
-    ]
-    return random.choice(farewells)
+    return random.choice(_FAREWELLS)
 
-def handle_place_reference(self, speech_result):
-    """Handle references to previously mentioned places"""
-    try:
-        speech_lower = speech_result.lower()
-        logger.info(f"\n=== Processing Place Reference ===")
-        logger.info(f"🎯 Input speech: '{speech_lower}'")
-        
-        # Reference keywords that indicate user is referring to a place
-        reference_keywords = [
-            'that one', 'this place', 'tell me more', 'more about', 
-            'what about', 'first one', 'second one', 'last one', 'third one',
-            'can you tell me about', 'what is', 'how is', 'the first',
-            'that first', 'that place', 'this one', 'it', 'that',
-            'first restaurant', 'second restaurant', 'third restaurant',
-            'first place', 'second place', 'third place'
-        ]
-        logger.info(f"🔍 Checking against {len(reference_keywords)} reference patterns")
-        
-        # Ordinal number mapping (0-based index)
-        ordinal_mapping = {
-            'first': 0, '1st': 0, 'one': 0,
-            'second': 1, '2nd': 1, 'two': 1,
-            'third': 2, '3rd': 2, 'three': 2,
-            'last': -1
-        }
-        
-        # Check if they're referring to the current place
-        if self.current_place and isinstance(self.current_place, dict):
-            current_title = self.current_place.get('metadata', {}).get('title', '').lower()
-            logger.info(f"📍 Current place in context: '{current_title}'")
-            
-            if current_title and (current_title in speech_lower or 
-                any(word in current_title for word in speech_lower.split() if len(word) > 3)):
-                logger.info(f"✅ Matched current place reference: {current_title}")
-                return self.current_place.get('id')
-        else:
-            logger.info("ℹ️ No current place in context")
-        
-        # Check for ordinal references in current results
-        if self.current_results:
-            logger.info(f"🔢 Checking ordinal references against {len(self.current_results)} current results")
-            for ordinal, index in ordinal_mapping.items():
-                if ordinal in speech_lower:
-                    logger.info(f"📊 Found ordinal reference: '{ordinal}' (index: {index})")
-                    if index == -1:
-                        index = len(self.current_results) - 1
-                    if 0 <= index < len(self.current_results):
-                        result = self.current_results[index]
-                        if isinstance(result, dict):
-                            title = result.get('metadata', {}).get('title', '')
-                            logger.info(f"✅ Matched ordinal reference to: {title}")
-                            self.set_current_place(result.get('id'), result.get('metadata', {}))
-                            return result.get('id')
-        else:
-            logger.info("ℹ️ No current results to check ordinal references against")
-        
-        # Check for partial name matches in all results
-        speech_words = [word for word in speech_lower.split() if len(word) > 3]
-        all_results = self.current_results + (self.remaining_results or [])
-        
-        if speech_words:
-            logger.info(f"🔤 Checking partial name matches with words: {speech_words}")
-            
-            for result in all_results:
-                if isinstance(result, dict):
-                    title = result.get('metadata', {}).get('title', '').lower()
-                    if title and any(word in title for word in speech_words):
-                        logger.info(f"✅ Found partial name match: '{title}'")
-                        self.set_current_place(result.get('id'), result.get('metadata', {}))
-                        return result.get('id')
-        
-        # Check place name map for exact matches
-        if hasattr(self, 'place_name_map'):
-            logger.info(f"📚 Checking exact matches in place name map ({len(self.place_name_map)} entries)")
-            for name, place_id in self.place_name_map.items():
-                if name.lower() in speech_lower:
-                    logger.info(f"✅ Found exact name match: '{name}'")
-                    for result in all_results:
-                        if isinstance(result, dict) and result.get('id') == place_id:
-                            self.set_current_place(result.get('id'), result.get('metadata', {}))
-                            return place_id
-        
-        logger.info("❌ No place reference found in speech")
-        return None
-        
-    except Exception as e:
-        logger.error(f"❌ Error handling place reference: {str(e)}")
-        logger.exception("Full error traceback:")
-        return None
+# Reference keywords that indicate user is referring to a place
+_REFERENCE_KEYWORDS = frozenset(sys.intern(k) for k in (
+    'that one', 'this place', 'tell me more', 'more about',
+    'what about', 'first one', 'second one', 'last one', 'third one',
+    'can you tell me about', 'what is', 'how is', 'the first',
+    'that first', 'that place', 'this one', 'it', 'that',
+    'first restaurant', 'second restaurant', 'third restaurant',
+    'first place', 'second place', 'third place'
+))
+
+# Ordinal number mapping (0-based index), checked in order
+_ORDINAL_MAPPING = (
+    ('first', 0), ('1st', 0), ('one', 0),
+    ('second', 1), ('2nd', 1), ('two', 1),
+    ('third', 2), ('3rd', 2), ('three', 2),
+    ('last', -1)
+)
+# Zero-width lookahead so overlapping ordinals are all found in one scan
+_ORDINAL_RE = re.compile('(?=(%s))' % '|'.join(re.escape(ordinal) for ordinal, _ in _ORDINAL_MAPPING))
+
+# Interruption keywords, compiled once so each utterance is scanned in a
+# single regex pass per group instead of one substring test per keyword
+_STOP_RE = _compile_keywords(['stop', 'wait', 'hold on', 'pause', 'excuse me', 'hang on', 'one second', 'just a minute'])
+_PLACE_INQUIRY_RE = _compile_keywords([
+    'tell me more about', 'what about', 'can you tell me about',
+    'more information', 'details about', 'tell me about',
+    'first', 'second', 'third', 'last', 'that one'
+])
+_REDIRECT_RE = _compile_keywords(['but', 'actually', 'instead', 'rather'])
+_ASPECT_RES = tuple((aspect, _compile_keywords(keywords)) for aspect, keywords in (
+    ('price', ['how much', 'price', 'expensive', 'cheap', 'cost', 'pricing', 'budget']),
+    ('hours', ['when', 'hours', 'open', 'close', 'time', 'today', 'tomorrow', 'weekend']),
+    ('location', ['where', 'located', 'address', 'far', 'distance', 'get there', 'directions']),
+    ('menu', ['menu', 'serve', 'food', 'dish', 'specialty', 'eat', 'cuisine', 'options']),
+    ('reservation', ['reserve', 'book', 'reservation', 'table', 'tonight', 'available']),
+    ('atmosphere', ['atmosphere', 'like', 'crowd', 'busy', 'quiet', 'romantic', 'family']),
+    ('parking', ['parking', 'park', 'garage', 'valet']),
+    ('reviews', ['reviews', 'ratings', 'people say', 'popular', 'recommend'])
+))
+# Zero-width lookahead over every aspect keyword, one named group per aspect in
+# priority order, so a single scan finds each aspect mentioned anywhere
+_ASPECT_RE = re.compile('(?=%s)' % '|'.join(f'(?P<{aspect}>{pattern.pattern})' for aspect, pattern in _ASPECT_RES))
+_ASPECT_PRIORITY = {aspect: i for i, (aspect, _) in enumerate(_ASPECT_RES)}
+
+def _match_aspect(speech_lower):
+    """Highest-priority aspect mentioned in the utterance, or None"""
+    return min(
+        (match.lastgroup for match in _ASPECT_RE.finditer(speech_lower)),
+        key=_ASPECT_PRIORITY.__getitem__,
+        default=None
+    )
+
+_PRICE_DESCRIPTIONS = {
+    '$': "It's very budget-friendly",
+    '$$': "It's moderately priced",
+    '$$$': "It's on the upscale side",
+    '$$$$': "It's a high-end establishment"
+}
+
+def _answer_price(place):
+    """Answer a question about how expensive the place is"""
+    response = _PRICE_DESCRIPTIONS.get(place.get('price_level'), "I don't have exact price information, but I can find similar restaurants in your preferred price range.")
+    return f"{response} Would you like to know anything else about {place.get('title')}?"
+
+def _answer_hours(place):
+    """Answer a question about opening hours"""
+    hours = place.get('hours')
+    if hours:
+        return f"They're open {hours}. Would you like me to check if they're busy right now?"
+    return "Let me check their current hours for you. Would you like me to call them?"
+
+def _answer_location(place):
+    """Answer a question about where the place is"""
+    address = place.get('address')
+    if address:
+        return f"It's located at {address}. Would you like directions or should I find something closer to you?"
+    return "Let me get you the exact location. Would you prefer walking or driving directions?"
+
+def _answer_menu(place):
+    """Answer a question about the food"""
+    desc = place.get('description', '')
+    features = place.get('features', '')
+    response = f"Let me tell you about their food. {desc} {features}".strip()
+    return f"{response} Would you like to know about any specific dishes or dietary options?"
+
+def _answer_reservation(place):
+    """Answer a question about booking a table"""
+    phone = place.get('phone')
+    if phone:
+        return f"I can help you make a reservation. Their number is {phone}. Would you like me to call them for you?"
+    return "I can help you book a table. What time were you thinking of going?"
+
+def _answer_atmosphere(place):
+    """Answer a question about the atmosphere"""
+    atmosphere = place.get('atmosphere', 'It has a great ambiance')
+    return f"{atmosphere}. Are you looking for something specific in terms of atmosphere?"
+
+def _answer_parking(place):
+    """Answer a question about parking"""
+    parking = place.get('parking', "Let me check their parking situation for you")
+    return f"{parking}. Would you like me to find places with easier parking?"
+
+def _answer_reviews(place):
+    """Answer a question about ratings and reviews"""
+    rating = place.get('rating')
+    reviews = place.get('reviews')
+    if rating and reviews:
+        return f"It has {rating} stars from {reviews} reviews. Would you like to hear what people specifically love about it?"
+    return "Let me check what recent visitors have said about it. Any specific aspects you're curious about?"
+
+# Aspect -> answer built from the current place's metadata
+_ASPECT_HANDLERS = {
+    'price': _answer_price,
+    'hours': _answer_hours,
+    'location': _answer_location,
+    'menu': _answer_menu,
+    'reservation': _answer_reservation,
+    'atmosphere': _answer_atmosphere,
+    'parking': _answer_parking,
+    'reviews': _answer_reviews
+}
 
 def handle_interruption(speech_result):
     """Handle user interruptions and follow-up questions"""
+    context = get_ctx()
     speech_lower = speech_result.lower()
     
-    # Common interruption patterns with more natural language
-    stop_patterns = ['stop', 'wait', 'hold on', 'pause', 'excuse me', 'hang on', 'one second', 'just a minute']
-    
     # Check for direct interruptions first
-    if any(pattern in speech_lower for pattern in stop_patterns):
-        conversation_context.interrupted = True
+    if _STOP_RE.search(speech_lower):
+        context.interrupted = True
         return True, "Of course! I'll pause right there. What would you like to know?"
     
     # Don't treat place inquiries as interruptions
-    place_inquiry_patterns = [
-        'tell me more about', 'what about', 'can you tell me about',
-        'more information', 'details about', 'tell me about',
-        'first', 'second', 'third', 'last', 'that one'
-    ]
-    if any(pattern in speech_lower for pattern in place_inquiry_patterns):
+    if _PLACE_INQUIRY_RE.search(speech_lower):
         return False, None
     
     # Check if user is trying to redirect the conversation
-    redirect_patterns = ['but', 'actually', 'instead', 'rather']
-    if any(pattern in speech_lower for pattern in redirect_patterns):
-        conversation_context.interrupted = True
+    if _REDIRECT_RE.search(speech_lower):
+        context.interrupted = True
         return True, "Let me address that for you instead. What would you like to know?"
     
     # Question about a specific aspect of the current place
-    if conversation_context.current_place:
-        place = conversation_context.current_place['metadata']
-        
-        aspect_patterns = {
-            'price': ['how much', 'price', 'expensive', 'cheap', 'cost', 'pricing', 'budget'],
-            'hours': ['when', 'hours', 'open', 'close', 'time', 'today', 'tomorrow', 'weekend'],
-            'location': ['where', 'located', 'address', 'far', 'distance', 'get there', 'directions'],
-            'menu': ['menu', 'serve', 'food', 'dish', 'specialty', 'eat', 'cuisine', 'options'],
-            'reservation': ['reserve', 'book', 'reservation', 'table', 'tonight', 'available'],
-            'atmosphere': ['atmosphere', 'like', 'crowd', 'busy', 'quiet', 'romantic', 'family'],
-            'parking': ['parking', 'park', 'garage', 'valet'],
-            'reviews': ['reviews', 'ratings', 'people say', 'popular', 'recommend']
-        }
+    if context.current_place:
+        place = context.current_place['metadata']
         
-        for aspect, patterns in aspect_patterns.items():
-            if any(pattern in speech_lower for pattern in patterns):
-                if aspect == 'price':
-                    price_desc = {
-                        '$': "It's very budget-friendly",
-                        '$$': "It's moderately priced",
-                        '$$$': "It's on the upscale side",
-                        '$$$$': "It's a high-end establishment"
-                    }
-                    response = price_desc.get(place.get('price_level'), "I don't have exact price information, but I can find similar restaurants in your preferred price range.")
-                    return True, f"{response} Would you like to know anything else about {place.get('title')}?"
-                    
-                elif aspect == 'hours':
-                    hours = place.get('hours')
-                    if hours:
-                        return True, f"They're open {hours}. Would you like me to check if they're busy right now?"
-                    return True, "Let me check their current hours for you. Would you like me to call them?"
-                    
-                elif aspect == 'location':
-                    address = place.get('address')
-                    if address:
-                        return True, f"It's located at {address}. Would you like directions or should I find something closer to you?"
-                    return True, "Let me get you the exact location. Would you prefer walking or driving directions?"
-                    
-                elif aspect == 'menu':
-                    desc = place.get('description', '')
-                    features = place.get('features', '')
-                    response = f"Let me tell you about their food. {desc} {features}".strip()
-                    return True, f"{response} Would you like to know about any specific dishes or dietary options?"
-                    
-                elif aspect == 'reservation':
-                    phone = place.get('phone')
-                    if phone:
-                        return True, f"I can help you make a reservation. Their number is {phone}. Would you like me to call them for you?"
-                    return True, "I can help you book a table. What time were you thinking of going?"
-                    
-                elif aspect == 'atmosphere':
-                    atmosphere = place.get('atmosphere', 'It has a great ambiance')
-                    return True, f"{atmosphere}. Are you looking for something specific in terms of atmosphere?"
-                    
-                elif aspect == 'parking':
-                    parking = place.get('parking', "Let me check their parking situation for you")
-                    return True, f"{parking}. Would you like me to find places with easier parking?"
-                    
-                elif aspect == 'reviews':
-                    rating = place.get('rating')
-                    reviews = place.get('reviews')
-                    if rating and reviews:
-                        return True, f"It has {rating} stars from {reviews} reviews. Would you like to hear what people specifically love about it?"
-                    return True, "Let me check what recent visitors have said about it. Any specific aspects you're curious about?"
+        aspect = _match_aspect(speech_lower)
+        if aspect:
+            return True, _ASPECT_HANDLERS[aspect](place)
     
     return False, None
 
-def generate_voice_response(text, voice_name=None, conversation_type="initial"):
-    """Generate voice response using ElevenLabs with parallel processing"""
+_TTS_WHITESPACE = re.compile(r'\s+')
+_TTS_TRAILING_PUNCT = re.compile(r'[\s.,;:]+$')
+
+def _normalize_tts_text(text):
+    """Collapse differences that don't change how a chunk is spoken"""
+    text = _TTS_WHITESPACE.sub(' ', text.strip())
+    text = text.replace('\u2019', "'").replace('\u2018', "'").replace('\u201c', '"').replace('\u201d', '"')
+    return _TTS_TRAILING_PUNCT.sub('', text)
+
+def _tts_cache_key(text, voice_id, model=TTS_MODEL):
+    """Build a content-addressed cache key for a synthesized chunk"""
+    normalized = _normalize_tts_text(text)
+    return hashlib.blake2b(f"{voice_id}\0{model}\0{normalized}".encode('utf-8'), digest_size=16).hexdigest()
+
+def _temp_audio_path(prefix="audio"):
+    """Unique, unguessable path for a per-request file served at /audio/<name>"""
+    return f"{TEMP_AUDIO_DIR}{os.sep}{prefix}_{secrets.token_hex(8)}.mp3"
+
+def _copy_to_temp(cached_path, prefix="audio"):
+    """Give a request its own copy of a cached file, since served files are deleted"""
+    temp_path = _temp_audio_path(prefix)
+    try:
+        os.link(cached_path, temp_path)
+        # Links share the cache file's inode; refresh its mtime so the sweeper
+        # sees the handed-out copy as new
+        os.utime(temp_path)
+    except OSError:
+        with os.fdopen(os.open(cached_path, os.O_RDONLY | _O_NOATIME), 'rb') as src, open(temp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        # Keep the cache file's mtime as its last-used time for curate_tts_cache
+        os.utime(cached_path)
+    return temp_path
+
+def get_cached_audio(key, prefix="audio"):
+    """Return a per-request copy of cached audio, or None on a cache miss"""
+    cached_path = _tts_cache.get(key) or os.path.join(TTS_CACHE_DIR, f"{key}.mp3")
+    try:
+        if os.path.getsize(cached_path) > 0:
+            _tts_cache[key] = cached_path
+            return _copy_to_temp(cached_path, prefix)
+    except OSError:
+        _tts_cache.pop(key, None)
+    return None
+
+def _retry_delay(retry_after, attempt):
+    """Seconds to wait before retrying a rate-limited request"""
     try:
-        conversation_context.last_response = text
-        voice_id = conversation_context.current_voice['id'] if conversation_context.current_voice else select_random_voice()
+        return min(float(retry_after), TTS_MAX_RETRY_DELAY)
+    except (TypeError, ValueError):
+        return min(0.5 * 2 ** attempt + random.uniform(0, 0.25), TTS_MAX_RETRY_DELAY)
+
+def _synthesize_to_file(text, voice_id, path, model=TTS_MODEL):
+    """Stream synthesized mp3 audio straight to path, returning the bytes written"""
+    for attempt in itertools.count():
+        with _tts_slots:
+            with _tts_client.stream(
+                'POST',
+                ELEVENLABS_TTS_URL.format(voice_id=voice_id),
+                params={'optimize_streaming_latency': TTS_STREAMING_LATENCY} if TTS_STREAMING_LATENCY else None,
+                json={'text': text, 'model_id': model}
+            ) as response:
+                if response.status_code != 429 or attempt >= TTS_MAX_RETRIES:
+                    response.raise_for_status()
+                    written = 0
+                    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | _O_NOATIME, 0o644)
+                    with os.fdopen(fd, 'wb', buffering=1 << 16) as audio_file:
+                        for data in response.iter_bytes(chunk_size=16 * 1024):
+                            audio_file.write(data)
+                            written += len(data)
+                    return written
+                delay = _retry_delay(response.headers.get('Retry-After'), attempt)
+            # Back off while still holding the slot so other calls don't pile onto the limit
+            logger.warning(f"⏳ ElevenLabs rate limited, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def tts_get_or_synthesize(text, voice_id, model=TTS_MODEL, prefix="audio"):
+    """Return a per-request audio file for text, synthesizing only on a cache miss
+
+    Only non-empty audio is ever cached or returned; None means nothing was produced.
+    """
+    cache_key = _tts_cache_key(text, voice_id, model)
+    cached_path = get_cached_audio(cache_key, prefix)
+    if cached_path:
+        logger.debug(f"TTS cache hit for '{text[:30]}'")
+        return cached_path
+    
+    # Single-flight: concurrent misses for the same key share one synthesis
+    with _tts_inflight_lock:
+        inflight = _tts_inflight.get(cache_key)
+        owner = inflight is None
+        if owner:
+            inflight = _tts_inflight[cache_key] = concurrent.futures.Future()
+    
+    if not owner:
+        cached_path = inflight.result()
+        return _copy_to_temp(cached_path, prefix) if cached_path else None
+    
+    try:
+        cached_path = _synthesize_to_cache(text, voice_id, model, cache_key)
+        inflight.set_result(cached_path)
+    except BaseException as e:
+        inflight.set_exception(e)
+        raise
+    finally:
+        with _tts_inflight_lock:
+            _tts_inflight.pop(cache_key, None)
+    
+    return _copy_to_temp(cached_path, prefix) if cached_path else None
+
+def _synthesize_to_cache(text, voice_id, model, cache_key):
+    """Synthesize into the cache, returning the cached path or None"""
+    # Stream into a private partial file, then publish it atomically
+    cached_path = os.path.join(TTS_CACHE_DIR, f"{cache_key}.mp3")
+    partial_path = f"{cached_path}.{secrets.token_hex(4)}.tmp"
+    try:
+        if not _synthesize_to_file(text, voice_id, partial_path, model):
+            return None
+        os.replace(partial_path, cached_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+    
+    _tts_cache[cache_key] = cached_path
+    return cached_path
+
+def _generate_chunk(chunk, index, total, voice_id):
+    """Synthesize one response chunk, returning its audio path or None"""
+    try:
+        temp_path = tts_get_or_synthesize(chunk, voice_id)
         
-        # Break response into smaller chunks
-        chunks = chunk_response(text)
-        responses = []
+        if temp_path:
+            logger.info(f"Successfully generated chunk {index+1}/{total}")
+            return temp_path
         
-        temp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'temp_audio')
-        os.makedirs(temp_dir, exist_ok=True)
+        logger.error(f"Failed to generate audio for chunk {index+1}")
+        return None
         
-        logger.info(f"Generating {len(chunks)} audio chunks")
+    except Exception as e:
+        logger.error(f"Error processing chunk {index+1}: {str(e)}")
+        return None
+
+def iter_voice_response(text, voice_id, batch_synthesis=False):
+    """Yield audio paths in chunk order, each as soon as it is ready"""
+    # Break response into smaller chunks, dropping any too short to be worth a request
+    chunks = [chunk for chunk in chunk_response(text) if len(chunk.strip()) >= MIN_SPOKEN_CHUNK]
+    if batch_synthesis and len(chunks) > 1:
+        # One request for the whole response, with short pauses where chunks would split
+        chunks = [CHUNK_BREAK.join(chunks)]
+    logger.info(f"Generating {len(chunks)} audio chunks")
+    
+    # Queue every chunk at once; the shared executor and _tts_slots keep at
+    # most TTS_CONCURRENCY requests in flight, starting the next chunk as soon
+    # as a worker frees up
+    futures = [
+        _tts_executor.submit(_generate_chunk, chunk, i, len(chunks), voice_id)
+        for i, chunk in enumerate(chunks)
+    ]
+    try:
+        for future in futures:
+            path = future.result()
+            if path is not None:
+                yield path
+    finally:
+        # Don't synthesize chunks nobody is going to play
+        for future in futures:
+            future.cancel()
+
+# Fixed lines spoken verbatim by the voice flow, synthesized ahead of time
+# so they are served from the TTS cache on the hot path
+PHRASEBOOK = (
+    "Hi! I'm your local guide. Which city can I help you explore?",
+    "Hello! I'm here to help you discover great places. What city are you interested in?",
+    "Welcome! I'm your personal local guide. Which city would you like to explore?",
+    "Just a moment while I find the perfect places for you...",
+    "Let me search for some great options...",
+    "I'll help you find exactly what you're looking for...",
+    "I couldn't find any places matching your criteria. Would you like to try a different search?",
+    "I found some places that match your criteria. Would you like me to tell you about them?",
+    "Of course! I'll pause right there. What would you like to know?",
+    "Let me address that for you instead. What would you like to know?",
+    "Let me check their current hours for you. Would you like me to call them?",
+    "It was great helping you today! Feel free to ask me about any other places you'd like to discover.",
+    "I enjoyed being your guide! Don't hesitate to ask if you need more recommendations.",
+    "Thanks for letting me help! I'm always here when you need to find great places to visit.",
+)
+
+def prewarm_phrasebook(voice_ids):
+    """Queue synthesis of every uncached PHRASEBOOK chunk for the given voices"""
+    chunks = {chunk for phrase in PHRASEBOOK for chunk in chunk_response(phrase)}
+    queued = 0
+    for voice_id in voice_ids:
+        for chunk in chunks:
+            key = _tts_cache_key(chunk, voice_id)
+            if os.path.exists(os.path.join(TTS_CACHE_DIR, f"{key}.mp3")):
+                continue
+            _prewarm_executor.submit(_prewarm_chunk, chunk, voice_id)
+            queued += 1
+    logger.info(f"🔥 Queued {queued} phrasebook chunks for pre-synthesis")
+    return queued
+
+def _prewarm_chunk(chunk, voice_id):
+    """Synthesize a phrasebook chunk into the TTS cache"""
+    try:
+        cleanup_audio_file(tts_get_or_synthesize(chunk, voice_id))
+    except Exception as e:
+        logger.error(f"Failed to pre-synthesize phrasebook chunk: {str(e)}")
+
+def generate_voice_response(text, voice_name=None, conversation_type="initial", batch_synthesis=False):
+    """Generate voice response using ElevenLabs with parallel processing"""
+    context = get_ctx()
+    try:
+        voice_id = context.current_voice['id'] if context.current_voice else select_random_voice()
+        batch = batch_synthesis and conversation_type == "details"
+        response_key = (text, voice_id, batch)
         
-        def generate_chunk(chunk_data):
-            chunk, index = chunk_data
-            try:
-                if not chunk or len(chunk.strip()) < 10:
-                    return None
-                    
-                audio = elevenlabs_generate(
-                    text=chunk,
-                    voice=voice_id,
-                    model="eleven_monolingual_v1"
-                )
-                
-                if not audio:
-                    logger.error(f"Failed to generate audio for chunk {index+1}")
-                    return None
-                
-                temp_filename = f"audio_{os.urandom(8).hex()}.mp3"
-                temp_path = os.path.join(temp_dir, temp_filename)
-                
-                with open(temp_path, 'wb') as temp_file:
-                    temp_file.write(audio)
-                
-                if os.path.exists(temp_path) and os.path.getsize(temp_path) > 0:
-                    logger.info(f"Successfully generated chunk {index+1}/{len(chunks)}")
-                    return temp_path
-                return None
-                
-            except Exception as e:
-                logger.error(f"Error processing chunk {index+1}: {str(e)}")
-                return None
-        
-        # Process chunks in batches of 2 to respect concurrent request limit
-        batch_size = 2
-        for i in range(0, len(chunks), batch_size):
-            batch_chunks = chunks[i:i + batch_size]
-            
-            # Use ThreadPoolExecutor for parallel processing of current batch
-            with ThreadPoolExecutor(max_workers=batch_size) as executor:
-                batch_futures = list(executor.map(
-                    generate_chunk,
-                    [(chunk, i + idx) for idx, chunk in enumerate(batch_chunks)]
-                ))
-                
-                # Add successful responses from this batch
-                responses.extend([r for r in batch_futures if r is not None])
+        # Replay the previous files if the same response is requested again before it was served
+        last_paths = context.last_response_paths
+        if response_key == context.last_response_key and last_paths and all(os.path.exists(p) for p in last_paths):
+            logger.info("Reusing audio from the previous identical response")
+            return list(last_paths)
+        
+        context.last_response = text
+        responses = list(iter_voice_response(text, voice_id, batch_synthesis=batch))
         
         if not responses:
             logger.error("No audio responses were generated successfully")
-            error_message = "I apologize, but I'm having trouble speaking. Let me try again with a simpler response."
-            return [generate_error_audio(error_message, temp_dir)]
-            
+            return [generate_error_audio(NO_AUDIO_ERROR_MESSAGE)]
+        
+        context.last_response_key = response_key
+        context.last_response_paths = list(responses)
         return responses
             
     except Exception as e:
         logger.error(f"❌ Error generating voice response: {str(e)}")
         logger.exception("Full error traceback:")
-        error_message = "I'm having trouble speaking right now. Please try again."
-        return [generate_error_audio(error_message, temp_dir)]
+        return [generate_error_audio(SPEECH_ERROR_MESSAGE)]
 
-def generate_error_audio(error_message, temp_dir):
+# Fallback lines spoken in the Antoni voice when response synthesis fails
+ERROR_VOICE_ID = "ErXwobaYiN019PkySvjV"
+NO_AUDIO_ERROR_MESSAGE = "I apologize, but I'm having trouble speaking. Let me try again with a simpler response."
+SPEECH_ERROR_MESSAGE = "I'm having trouble speaking right now. Please try again."
+
+def submit_error_audio(error_message):
+    """Generate error audio on the TTS workers, returning a Future of its path"""
+    return _tts_executor.submit(generate_error_audio, error_message)
+
+def generate_error_audio(error_message):
     """Generate a simple error message audio file"""
     try:
         # Use Antoni voice for error messages - more reliable
-        audio = elevenlabs_generate(
-            text=error_message,
-            voice="ErXwobaYiN019PkySvjV",  # Antoni voice
-            model="eleven_monolingual_v1"
-        )
+        temp_path = tts_get_or_synthesize(error_message, ERROR_VOICE_ID, prefix="error_audio")
         
-        if not audio:
+        if not temp_path:
             logger.error("Failed to generate error audio")
             return None
             
-        temp_filename = f"error_audio_{os.urandom(8).hex()}.mp3"
-        temp_path = os.path.join(temp_dir, temp_filename)
-        
-        with open(temp_path, 'wb') as temp_file:
-            temp_file.write(audio)
-            
-        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-            logger.error("Failed to create valid error audio file")
-            return None
-            
         return temp_path
         
     except Exception as e:
         logger.error(f"Failed to generate error audio: {str(e)}")
         return None
 
+# Served files are unlinked by a background thread, off the request path
+CLEANUP_BATCH_SIZE = 64
+_cleanup_queue = queue.Queue()
+_cleanup_thread = None
+_cleanup_thread_lock = threading.Lock()
+
+def _cleanup_worker():
+    """Unlink queued audio files, draining them in batches"""
+    while True:
+        paths = [_cleanup_queue.get()]
+        try:
+            while len(paths) < CLEANUP_BATCH_SIZE:
+                paths.append(_cleanup_queue.get_nowait())
+        except queue.Empty:
+            pass
+        for path in paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"❌ Error cleaning up audio file: {str(e)}")
+        logger.debug("🗑️ Cleaned up %d audio files", len(paths))
+
 def cleanup_audio_file(file_path):
-    """Clean up temporary audio file"""
+    """Queue a temporary audio file for deletion"""
+    global _cleanup_thread
+    if not file_path:
+        return
+    # Started on first use so it also runs in worker processes forked after import
+    if _cleanup_thread is None or not _cleanup_thread.is_alive():
+        with _cleanup_thread_lock:
+            if _cleanup_thread is None or not _cleanup_thread.is_alive():
+                _cleanup_thread = threading.Thread(target=_cleanup_worker, name="audio-cleanup", daemon=True)
+                _cleanup_thread.start()
+    _cleanup_queue.put_nowait(file_path)
+
+def sweep_temp_audio(max_age=TEMP_AUDIO_TTL):
+    """Delete per-request audio that was never served and abandoned partial cache files"""
+    cutoff = time.time() - max_age
+    removed = 0
+    for directory, suffix in ((TEMP_AUDIO_DIR, '.mp3'), (TTS_CACHE_DIR, '.tmp')):
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(suffix) or not entry.is_file():
+                        continue
+                    try:
+                        if entry.stat().st_mtime < cutoff:
+                            os.unlink(entry.path)
+                            removed += 1
+                    except FileNotFoundError:
+                        pass
+        except OSError as e:
+            logger.warning(f"Could not sweep {directory}: {str(e)}")
+    if removed:
+        logger.info(f"🧹 Swept {removed} stale audio files")
+    return removed
+
+def curate_tts_cache(max_bytes=TTS_CACHE_MAX_BYTES):
+    """Evict least recently used cached audio until the cache fits in max_bytes"""
+    files = []
+    total = 0
     try:
-        if file_path and os.path.exists(file_path):
-            logger.info(f"🗑️ Cleaning up audio file: {file_path}")
-            os.unlink(file_path)
-            logger.debug("Audio file successfully deleted")
-    except Exception as e:
-        logger.error(f"❌ Error cleaning up audio file: {str(e)}")
-        logger.exception("Full error traceback:")
+        with os.scandir(TTS_CACHE_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith('.mp3') and entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry))
+                    total += stat.st_size
+    except OSError as e:
+        logger.warning(f"Could not scan TTS cache: {str(e)}")
+        return 0
+    
+    removed = 0
+    if total > max_bytes:
+        # Oldest mtime first; handing out a cached file refreshes its mtime
+        files.sort(key=lambda f: f[0])
+        for _, size, entry in files:
+            if total <= max_bytes:
+                break
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+            _tts_cache.pop(entry.name[:-len('.mp3')], None)
+            total -= size
+            removed += 1
+    if removed:
+        logger.info(f"🧹 Evicted {removed} cached audio files to stay under {max_bytes // (1024 * 1024)} MB")
+    return removed
+
+_sweeper_thread = None
+
+def start_audio_sweeper(interval=SWEEP_INTERVAL, max_age=TEMP_AUDIO_TTL):
+    """Start the background thread that periodically sweeps stale audio files"""
+    global _sweeper_thread
+    if _sweeper_thread and _sweeper_thread.is_alive():
+        return _sweeper_thread
+    
+    def run():
+        while True:
+            time.sleep(interval)
+            sweep_temp_audio(max_age)
+            curate_tts_cache()
+    
+    _sweeper_thread = threading.Thread(target=run, name="audio-sweeper", daemon=True)
+    _sweeper_thread.start()
+    return _sweeper_thread
 
 def add_to_history(query, response, query_type='user_query'):
     """Add interaction to conversation history with timestamp"""
-    conversation_context.conversation_history.append({
-        'timestamp': datetime.datetime.now(),
+    context = get_ctx()
+    context.conversation_history.append({
+        'ts_ns': time.monotonic_ns(),
         'query': query,
         'response': response,
         'type': query_type
@@ -890,73 +1496,95 @@ def add_to_history(query, response, query_type='user_query'):
     
     # Update previous queries and responses
     if query:
-        conversation_context.previous_queries.append(query)
+        context.previous_queries.append(query)
+        context.query_count += 1
     if response:
-        conversation_context.previous_responses.append(response)
+        context.previous_responses.append(response)
         
     # Learn from the interaction
     if query_type == 'user_query':
         _update_preferences_from_query(query)
 
-def _update_preferences_from_query(query):
-    """Learn user preferences from their queries"""
-    query_lower = query.lower()
-    
+# Preference keyword -> (preference category, value); irregular forms that a
+# prefix match can't reach ('families', 'pricier') get their own entries
+_KW_TABLE = {
     # Price preferences
-    price_patterns = {
-        'cheap': 'budget',
-        'expensive': 'upscale',
-        'affordable': 'budget',
-        'fancy': 'upscale',
-        'high-end': 'upscale'
-    }
-    
+    'cheap': ('price', 'budget'),
+    'expensive': ('price', 'upscale'),
+    'affordable': ('price', 'budget'),
+    'fancy': ('price', 'upscale'),
+    'high-end': ('price', 'upscale'),
+    'pricey': ('price', 'upscale'),
+    'pricier': ('price', 'upscale'),
     # Cuisine preferences
-    cuisine_words = ['mexican', 'italian', 'chinese', 'indian', 'japanese', 'thai', 'mediterranean']
-    
+    'mexican': ('cuisine', 'mexican'),
+    'italian': ('cuisine', 'italian'),
+    'chinese': ('cuisine', 'chinese'),
+    'indian': ('cuisine', 'indian'),
+    'japanese': ('cuisine', 'japanese'),
+    'thai': ('cuisine', 'thai'),
+    'mediterranean': ('cuisine', 'mediterranean'),
     # Atmosphere preferences
-    atmosphere_patterns = {
-        'quiet': 'quiet',
-        'romantic': 'romantic',
-        'casual': 'casual',
-        'family': 'family-friendly',
-        'outdoor': 'outdoor',
-        'rooftop': 'rooftop'
-    }
+    'quiet': ('atmosphere', 'quiet'),
+    'romantic': ('atmosphere', 'romantic'),
+    'casual': ('atmosphere', 'casual'),
+    'family': ('atmosphere', 'family-friendly'),
+    'families': ('atmosphere', 'family-friendly'),
+    'outdoor': ('atmosphere', 'outdoor'),
+    'rooftop': ('atmosphere', 'rooftop')
+}
+# Keywords match as word prefixes so inflections count too ('cheaper', 'outdoors')
+_KW_RE = re.compile(
+    r"\b(" + "|".join(map(re.escape, sorted(_KW_TABLE, key=len, reverse=True))) + r")\w*",
+    re.IGNORECASE
+)
+
+def _set_preference(preferences, category, value):
+    """Record a single-valued preference, replacing any earlier one"""
+    preferences[category] = value
+
+def _add_preference(preferences, category, value):
+    """Add a value to a multi-valued preference"""
+    preferences.setdefault(category, set()).add(value)
+
+# How each preference category is recorded: price is a single value, the rest accumulate
+_PREFERENCE_UPDATERS = {
+    'price': _set_preference,
+    'cuisine': _add_preference,
+    'atmosphere': _add_preference
+}
+
+def _update_preferences_from_query(query):
+    """Learn user preferences from their queries"""
+    context = get_ctx()
+    preferences = context.user_preferences
     
-    # Update preferences based on the query
-    for pattern, pref in price_patterns.items():
-        if pattern in query_lower:
-            conversation_context.user_preferences['price'] = pref
-            
-    for cuisine in cuisine_words:
-        if cuisine in query_lower:
-            if 'cuisine' not in conversation_context.user_preferences:
-                conversation_context.user_preferences['cuisine'] = []
-            if cuisine not in conversation_context.user_preferences['cuisine']:
-                conversation_context.user_preferences['cuisine'].append(cuisine)
-                
-    for pattern, pref in atmosphere_patterns.items():
-        if pattern in query_lower:
-            if 'atmosphere' not in conversation_context.user_preferences:
-                conversation_context.user_preferences['atmosphere'] = []
-            if pref not in conversation_context.user_preferences['atmosphere']:
-                conversation_context.user_preferences['atmosphere'].append(pref)
+    # Update preferences based on the keywords in the query; only the matched
+    # keyword is lowercased, not the whole query
+    for match in _KW_RE.finditer(query):
+        category, value = _KW_TABLE[match.group(1).lower()]
+        _PREFERENCE_UPDATERS[category](preferences, category, value)
 
 def update_user_preferences(preferences):
     """Update user preferences based on their queries"""
-    conversation_context.user_preferences.update(preferences)
+    context = get_ctx()
+    context.user_preferences.update(preferences)
 
 def add_mentioned_place(place_id, place_name):
     """Track mentioned places for better context"""
-    conversation_context.mentioned_places.add((place_id, place_name))
+    context = get_ctx()
+    context.remember_place(place_id, place_name)
 
 def get_conversation_summary():
     """Get a summary of the entire conversation"""
+    context = get_ctx()
     return {
-        'city': conversation_context.current_city,
-        'query_count': len(conversation_context.previous_queries),
-        'mentioned_places': list(conversation_context.mentioned_places),
-        'preferences': conversation_context.user_preferences,
-        'last_query_type': conversation_context.last_query_type
+        'city': context.current_city,
+        'query_count': context.query_count,
+        'mentioned_places': list(context.mentioned_places.items()),
+        'preferences': {
+            key: sorted(value) if isinstance(value, set) else value
+            for key, value in context.user_preferences.items()
+        },
+        'last_query_type': context.last_query_type
     } 
\ No newline at end of file
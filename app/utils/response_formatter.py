@@ -1,68 +1,85 @@
+import functools
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+_EMOJI_MAP = {
+    'restaurant': '🍽️',
+    'cafe': '☕',
+    'coffee': '☕',
+    'bar': '🍸',
+    'club': '🎉',
+    'nightclub': '🎉',
+    'park': '🌳',
+    'trail': '🥾',
+    'school': '🎓',
+    'university': '🎓',
+    'law': '⚖️',
+    'financial': '💰',
+    'bank': '🏦',
+    'gym': '💪',
+    'shopping': '🛍️',
+    'mall': '🏬',
+    'hospital': '🏥',
+    'clinic': '🏥',
+    'library': '📚',
+    'museum': '🏛️',
+    'theater': '🎭',
+    'cinema': '🎬',
+    'hotel': '🏨',
+    'default': '📍'
+}
+_EMOJI_KEYS = [key for key in _EMOJI_MAP if key != 'default']
+# Zero-width lookahead with one group per key, so a single scan finds every key
+# present; the earliest key in _EMOJI_MAP order wins, as with the old loop
+_EMOJI_RE = re.compile('(?=%s)' % '|'.join(f'(?P<k{i}>{re.escape(key)})' for i, key in enumerate(_EMOJI_KEYS)))
+
 def get_place_type_emoji(place_type):
     """Get appropriate emoji for different place types"""
     type_lower = place_type.lower() if place_type else ""
-    emoji_map = {
-        'restaurant': '🍽️',
-        'cafe': '☕',
-        'coffee': '☕',
-        'bar': '🍸',
-        'club': '🎉',
-        'nightclub': '🎉',
-        'park': '🌳',
-        'trail': '🥾',
-        'school': '🎓',
-        'university': '🎓',
-        'law': '⚖️',
-        'financial': '💰',
-        'bank': '🏦',
-        'gym': '💪',
-        'shopping': '🛍️',
-        'mall': '🏬',
-        'hospital': '🏥',
-        'clinic': '🏥',
-        'library': '📚',
-        'museum': '🏛️',
-        'theater': '🎭',
-        'cinema': '🎬',
-        'hotel': '🏨',
-        'default': '📍'
-    }
-    
-    for key, emoji in emoji_map.items():
-        if key in type_lower:
-            return emoji
-    return emoji_map['default']
+    hits = [int(match.lastgroup[1:]) for match in _EMOJI_RE.finditer(type_lower)]
+    if hits:
+        return _EMOJI_MAP[_EMOJI_KEYS[min(hits)]]
+    return _EMOJI_MAP['default']
+
+# Stands in for metadata keys a place doesn't have, so cached formatters can
+# tell "absent" apart from a stored None
+_MISSING = object()
+_SMS_FIELDS = ('name', 'address', 'rating', 'price_level', 'phone', 'website')
 
 def format_place_for_sms(place):
     """Format place details for SMS"""
     if not place:
         return "Sorry, couldn't find exactly what you're looking for! Try another search!"
     
+    metadata = place.metadata
+    return _format_sms_cached(*(metadata.get(field, _MISSING) for field in _SMS_FIELDS))
+
+@functools.lru_cache(maxsize=4096)
+def _format_sms_cached(name, address, rating, price_level, phone, website):
+    """Build the SMS text for one place; repeat sends are served from cache"""
     # Build a concise SMS response
     response = [
-        f"🌟 {place.metadata.get('name', 'Unnamed Place')}",
-        f"📍 {place.metadata.get('address', 'Address not available')}",
+        f"🌟 {'Unnamed Place' if name is _MISSING else name}",
+        f"📍 {'Address not available' if address is _MISSING else address}",
     ]
     
     # Add rating if available
-    if 'rating' in place.metadata:
-        response.append(f"⭐ {place.metadata['rating']} stars")
+    if rating is not _MISSING:
+        response.append(f"⭐ {rating} stars")
     
     # Add price level if available
-    if 'price_level' in place.metadata:
-        response.append(f"💰 {'$' * int(place.metadata['price_level'])}")
+    if price_level is not _MISSING:
+        response.append(f"💰 {'$' * int(price_level)}")
     
     # Add phone if available
-    if 'phone' in place.metadata:
-        response.append(f"📞 {place.metadata['phone']}")
+    if phone is not _MISSING:
+        response.append(f"📞 {phone}")
     
     # Add website if available
-    if 'website' in place.metadata:
-        response.append(f"🌐 {place.metadata['website']}")
+    if website is not _MISSING:
+        response.append(f"🌐 {website}")
     
     return "\n".join(response)
 
@@ -72,9 +89,10 @@ def format_place_for_voice(place):
         return "Sorry, I couldn't find exactly what you're looking for. Try another search!"
     
     # Extract place details
-    name = place.metadata.get('name', 'this place')
-    rating = place.metadata.get('rating', 'N/A')
-    price = place.metadata.get('price_level', 'N/A')
+    metadata = place.metadata
+    name = metadata.get('name', 'this place')
+    rating = metadata.get('rating', 'N/A')
+    address = metadata.get('address', _MISSING)
     
     # Create a short, energetic response
     response = f"Found an amazing spot! {name}! "
@@ -82,9 +100,9 @@ def format_place_for_voice(place):
     if rating != 'N/A':
         response += f"It's got {rating} stars! "
     
-    if 'address' in place.metadata:
-        response += f"You'll find it at {place.metadata['address']}! "
+    if address is not _MISSING:
+        response += f"You'll find it at {address}! "
     
     response += "Check your phone for all the details!"
     
-    return response 
\ No newline at end of file
+    return response
@@ -1,13 +1,28 @@
 import pandas as pd
-from pinecone import Pinecone, ServerlessSpec
+from pinecone import ServerlessSpec
+# gRPC data plane: upserts from concurrent batches share one multiplexed channel
+from pinecone.grpc import PineconeGRPC as Pinecone
 from openai import OpenAI
 import os
 import json
+import orjson
 from tqdm import tqdm
 import time
+import random
+import base64
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 import logging
 
+try:
+    import tiktoken
+except ImportError:  # optional; embedding inputs are then trimmed by length
+    tiktoken = None
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -15,8 +30,48 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Initialize OpenAI client; rate-limited (429) requests are retried with exponential backoff
+client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=6)
+
+# Batches embedded and upserted concurrently
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '8'))
+UPSERT_ATTEMPTS = 5
+# Rows parsed from the CSV per read; memory stays bounded by this, not the file
+CSV_CHUNK_ROWS = 1000
+
+class TokenBucket:
+    """Thread-safe token bucket that only blocks once the budget is spent"""
+    
+    def __init__(self, rate_per_sec, burst):
+        self.rate = rate_per_sec
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, n_tokens=1):
+        """Take n_tokens, sleeping just long enough for the bucket to refill"""
+        # Requests larger than the burst are charged in full: the bucket goes
+        # into deficit and the caller waits for it to be paid back
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve the tokens now so concurrent callers queue behind this one
+            self.tokens -= n_tokens
+            wait_time = max(0, -self.tokens / self.rate)
+        if wait_time:
+            time.sleep(wait_time)
+
+# OpenAI embedding limits, tracked separately for requests and tokens
+EMBEDDING_RPM = int(os.getenv('EMBEDDING_RPM', '3000'))
+EMBEDDING_TPM = int(os.getenv('EMBEDDING_TPM', '1000000'))
+request_bucket = TokenBucket(EMBEDDING_RPM / 60, EMBEDDING_RPM / 60)
+token_bucket = TokenBucket(EMBEDDING_TPM / 60, EMBEDDING_TPM / 60)
+
+def estimate_tokens(text):
+    """Rough token count for rate limiting (~4 characters per token)"""
+    return len(text) // 4 + 1
 
 # Initialize Pinecone
 PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
@@ -52,12 +107,32 @@ def create_index_if_not_exists():
         logger.error(f"Error creating index: {e}")
         raise
 
+def is_missing(value):
+    """Null check for record values (None or NaN) without a pandas call per cell"""
+    return value is None or value != value
+
+def text_field(row, key):
+    """Column value as a string, '' when missing"""
+    value = row[key]
+    return '' if is_missing(value) else str(value)
+
+def number_field(row, key, cast=float):
+    """Column value converted with cast, zero when missing"""
+    value = row[key]
+    return cast(0) if is_missing(value) else cast(value)
+
 def parse_json_field(field, default=None):
     """Safely parse JSON field"""
-    if pd.isna(field):
+    if is_missing(field):
         return default
     try:
-        return json.loads(field)
+        return orjson.loads(field)
+    except orjson.JSONDecodeError:
+        # orjson is stricter than the stdlib parser (e.g. NaN, huge ints)
+        try:
+            return json.loads(field)
+        except:
+            return default
     except:
         return default
 
@@ -76,172 +151,304 @@ def extract_features_from_about(about_json):
         logger.warning(f"Error parsing about data: {e}")
     return features
 
-def create_rich_text_for_embedding(row):
+def parse_row_json(row):
+    """Parse a row's address and about JSON once, for both text and metadata"""
+    return parse_json_field(row['complete_address'], {}), extract_features_from_about(row['about'])
+
+def create_rich_text_for_embedding(row, address_data=None, features=None):
     """Create rich text description for embedding"""
-    components = []
+    if address_data is None or features is None:
+        address_data, features = parse_row_json(row)
+    
+    # Output must stay byte-identical: the embedding cache is keyed on this text
+    descriptions = row['descriptions']
+    review_rating = row['review_rating']
+    price_range = row['price_range']
+    user_reviews = row.get('user_reviews')
+    street = address_data.get('street')
+    borough = address_data.get('borough')
+    city = address_data.get('city')
     
     # Basic information
-    components.append(f"{row['title']} is a {row['category']}")
+    components = [f"{row['title']} is a {row['category']}"]
+    add = components.append
     
     # Location information
-    address_data = parse_json_field(row['complete_address'], {})
-    location_parts = []
-    if address_data.get('street'):
-        location_parts.append(address_data['street'])
-    if address_data.get('borough'):
-        location_parts.append(f"in the {address_data['borough']} area")
-    if address_data.get('city'):
-        location_parts.append(f"in {address_data['city']}, {address_data.get('state', 'Texas')}")
+    location_parts = [part for part in (
+        street,
+        borough and f"in the {borough} area",
+        city and f"in {city}, {address_data.get('state', 'Texas')}",
+    ) if part]
     if location_parts:
-        components.append(f"Located at {', '.join(location_parts)}")
+        add("Located at " + ", ".join(location_parts))
     
     # Description
-    if pd.notna(row['descriptions']):
-        components.append(str(row['descriptions']))
+    if not is_missing(descriptions):
+        add(str(descriptions))
     
     # Features and amenities from about field
-    features = extract_features_from_about(row['about'])
     if features:
-        components.append("Features and amenities include: " + ". ".join(features))
+        add("Features and amenities include: " + ". ".join(features))
     
     # Hours of operation
     hours_data = parse_json_field(row['open_hours'], {})
     if hours_data:
-        components.append("Operating hours: " + str(hours_data))
+        add("Operating hours: " + str(hours_data))
     
     # Ratings and reviews
-    if pd.notna(row['review_rating']):
-        components.append(f"Rated {row['review_rating']} stars based on {row['review_count']} reviews")
+    if not is_missing(review_rating):
+        add(f"Rated {review_rating} stars based on {row['review_count']} reviews")
     
     # Price information
-    if pd.notna(row['price_range']):
-        components.append(f"Price level: {row['price_range']}")
-    
-    # Additional context from user reviews
-    if pd.notna(row.get('user_reviews')):
-        reviews_data = parse_json_field(row['user_reviews'], [])
-        review_texts = []
-        for review in reviews_data[:3]:  # Include top 3 reviews
-            if review.get('Text'):
-                review_texts.append(review['Text'])
+    if not is_missing(price_range):
+        add(f"Price level: {price_range}")
+    
+    # Additional context from user reviews (top 3)
+    if not is_missing(user_reviews):
+        review_texts = [review['Text'] for review in parse_json_field(user_reviews, [])[:3] if review.get('Text')]
         if review_texts:
-            components.append("Customer reviews mention: " + " ".join(review_texts))
+            add("Customer reviews mention: " + " ".join(review_texts))
     
     return " ".join(components)
 
-def create_enhanced_metadata(row):
+def create_enhanced_metadata(row, address_data=None, about_data=None):
     """Create enhanced metadata for better filtering and retrieval"""
-    address_data = parse_json_field(row['complete_address'], {})
-    about_data = extract_features_from_about(row['about'])
+    if address_data is None or about_data is None:
+        address_data, about_data = parse_row_json(row)
     
     metadata = {
         'title': str(row['title']),
         'category': str(row['category']),
-        'address': str(row['address']) if pd.notna(row['address']) else '',
+        'address': text_field(row, 'address'),
         'city': address_data.get('city', '').strip(),
         'state': address_data.get('state', 'Texas'),
         'borough': address_data.get('borough', ''),
         'postal_code': address_data.get('postal_code', ''),
-        'rating': float(row['review_rating']) if pd.notna(row['review_rating']) else 0.0,
-        'reviews': int(row['review_count']) if pd.notna(row['review_count']) else 0,
-        'price_level': str(row['price_range']) if pd.notna(row['price_range']) else '',
-        'description': str(row['descriptions']) if pd.notna(row['descriptions']) else '',
-        'latitude': float(row['latitude']) if pd.notna(row['latitude']) else 0.0,
-        'longitude': float(row['longitude']) if pd.notna(row['longitude']) else 0.0,
-        'phone': str(row['phone']) if pd.notna(row['phone']) else '',
-        'website': str(row['website']) if pd.notna(row['website']) else '',
-        'hours': str(row['open_hours']) if pd.notna(row['open_hours']) else '',
-        'about': json.dumps(about_data) if about_data else '',
-        'google_maps_link': str(row['link']) if pd.notna(row['link']) else '',
-        'reviews_link': str(row['reviews_link']) if pd.notna(row['reviews_link']) else '',
-        'thumbnail': str(row['thumbnail']) if pd.notna(row['thumbnail']) else ''
+        'rating': number_field(row, 'review_rating'),
+        'reviews': number_field(row, 'review_count', int),
+        'price_level': text_field(row, 'price_range'),
+        'description': text_field(row, 'descriptions'),
+        'latitude': number_field(row, 'latitude'),
+        'longitude': number_field(row, 'longitude'),
+        'phone': text_field(row, 'phone'),
+        'website': text_field(row, 'website'),
+        'hours': text_field(row, 'open_hours'),
+        'about': orjson.dumps(about_data).decode('utf-8') if about_data else '',
+        'google_maps_link': text_field(row, 'link'),
+        'reviews_link': text_field(row, 'reviews_link'),
+        'thumbnail': text_field(row, 'thumbnail')
     }
     
     # Add price numeric value for better filtering
-    if pd.notna(row['price_range']):
-        price_str = str(row['price_range'])
-        if price_str.startswith('$'):
-            metadata['price_numeric'] = len(price_str.split('$')[0]) + 1
+    price_str = metadata['price_level']
+    if price_str.startswith('$'):
+        metadata['price_numeric'] = price_str.count('$')
     
     return metadata
 
-def create_embedding(text):
-    """Create embedding using OpenAI's API"""
-    if not text or pd.isna(text):
-        return None
-        
-    try:
-        response = client.embeddings.create(
-            input=text,
-            model="text-embedding-ada-002"
+# Most inputs the embeddings endpoint accepts in one request
+MAX_EMBEDDING_INPUTS = 2048
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# The model rejects inputs over 8191 tokens; leave some headroom
+MAX_EMBEDDING_TOKENS = 8000
+_encoding = tiktoken.encoding_for_model(EMBEDDING_MODEL) if tiktoken else None
+
+def truncate_for_embedding(text):
+    """Trim text to the embedding model's input limit"""
+    if _encoding is None:
+        # Without a tokenizer assume a conservative 3 characters per token
+        return text[:MAX_EMBEDDING_TOKENS * 3]
+    tokens = _encoding.encode(text)
+    if len(tokens) <= MAX_EMBEDDING_TOKENS:
+        return text
+    return _encoding.decode(tokens[:MAX_EMBEDDING_TOKENS])
+
+# Embeddings already computed, keyed by a hash of model and text, so re-runs and
+# duplicate descriptions never go back to the API. Opened by main() only
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', 'embedding_cache.sqlite3')
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def open_embedding_cache():
+    """Open (creating if needed) the on-disk embedding cache"""
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = sqlite3.connect(EMBEDDING_CACHE_PATH, check_same_thread=False)
+            _embedding_cache.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+def close_embedding_cache():
+    """Close the embedding cache if it is open"""
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is not None:
+            _embedding_cache.close()
+            _embedding_cache = None
+
+def embedding_cache_key(text):
+    """Content hash identifying an embedding input"""
+    return hashlib.blake2b(f"{EMBEDDING_MODEL}\0{text}".encode('utf-8'), digest_size=16).hexdigest()
+
+def load_cached_embeddings(keys):
+    """Return {key: packed float32 embedding} for the keys already in the cache"""
+    keys = list(keys)
+    found = {}
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            return found
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = _embedding_cache.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update(rows)
+    return found
+
+def save_cached_embeddings(entries):
+    """Store {key: packed float32 embedding}"""
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            return
+        _embedding_cache.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            entries.items()
         )
-        return response.data[0].embedding
+        _embedding_cache.commit()
+
+def create_embeddings(texts):
+    """Create embeddings as an (N, 1536) float32 array, requesting only uncached unique texts"""
+    keys = [embedding_cache_key(text) for text in texts]
+    try:
+        embeddings = load_cached_embeddings(set(keys))
+        
+        # Each distinct uncached text is sent once, in requests of up to 2048 inputs
+        pending = {key: text for key, text in zip(keys, texts) if key not in embeddings}
+        pending_keys = list(pending)
+        for start in range(0, len(pending_keys), MAX_EMBEDDING_INPUTS):
+            batch_keys = pending_keys[start:start + MAX_EMBEDDING_INPUTS]
+            request_bucket.acquire()
+            token_bucket.acquire(sum(estimate_tokens(pending[key]) for key in batch_keys))
+            # base64 responses are the raw float32 bytes: half the payload of
+            # JSON float text and no per-element Python floats to build
+            response = client.embeddings.create(
+                input=[pending[key] for key in batch_keys],
+                model=EMBEDDING_MODEL,
+                encoding_format="base64"
+            )
+            # Results carry their input position; don't rely on response order
+            created = {batch_keys[item.index]: base64.b64decode(item.embedding) for item in response.data}
+            save_cached_embeddings(created)
+            embeddings.update(created)
+        
+        if pending:
+            logger.info(f"Embedded {len(pending)} new texts, {len(texts) - len(pending)} served from cache")
+        return np.frombuffer(b''.join(embeddings[key] for key in keys), dtype=np.float32).reshape(len(keys), -1)
     except Exception as e:
-        logger.error(f"Error creating embedding: {e}")
+        logger.error(f"Error creating embeddings: {e}")
         return None
 
 def process_batch(index, batch_df, batch_size=100):
     """Process a batch of records with enhanced text and metadata"""
-    vectors = []
+    rows = []
+    texts = []
+    
+    # Plain dict records are much cheaper to build than iterrows() Series
+    for idx, row in zip(batch_df.index, batch_df.to_dict(orient='records')):
+        try:
+            # Parse the JSON columns once and share them with the metadata builder
+            address_data, features = parse_row_json(row)
+            # Long review text can push a row past the model's input limit
+            texts.append(truncate_for_embedding(create_rich_text_for_embedding(row, address_data, features)))
+            rows.append((idx, row, address_data, features))
+        except Exception as e:
+            logger.error(f"Error processing row {idx}: {e}")
+            continue
     
-    for idx, row in batch_df.iterrows():
+    if not texts:
+        return
+    
+    # One embeddings request for the whole batch instead of one per row
+    embeddings = create_embeddings(texts)
+    if embeddings is None:
+        logger.warning(f"Skipping {len(texts)} rows due to embedding creation failure")
+        return
+    
+    vectors = []
+    for (idx, row, address_data, features), embedding in zip(rows, embeddings):
         try:
-            # Create rich text for embedding
-            text_for_embedding = create_rich_text_for_embedding(row)
-            
-            # Create embedding
-            embedding = create_embedding(text_for_embedding)
-            if embedding is None:
-                logger.warning(f"Skipping row {idx} due to embedding creation failure")
-                continue
-            
-            # Create enhanced metadata
-            metadata = create_enhanced_metadata(row)
-            
-            # Create vector object
-            vector = {
-                'id': f"place_{idx}",
-                'values': embedding,
-                'metadata': metadata
-            }
-            
-            vectors.append(vector)
-            
+            # (id, values, metadata) tuples are the leanest form upsert accepts
+            vectors.append((
+                f"place_{idx}",
+                embedding.tolist(),
+                create_enhanced_metadata(row, address_data, features)
+            ))
         except Exception as e:
             logger.error(f"Error processing row {idx}: {e}")
             continue
     
     if vectors:
         try:
-            index.upsert(vectors=vectors)
+            upsert_with_retry(index, vectors)
             logger.info(f"Successfully upserted {len(vectors)} vectors")
         except Exception as e:
             logger.error(f"Error upserting vectors: {e}")
             raise
 
+def upsert_with_retry(index, vectors, attempts=UPSERT_ATTEMPTS):
+    """Upsert vectors, backing off exponentially on transient failures"""
+    for attempt in range(attempts):
+        try:
+            return index.upsert(vectors=vectors)
+        except Exception as e:
+            if attempt == attempts - 1:
+                raise
+            delay = 2 ** attempt + random.uniform(0, 1)
+            logger.warning(f"Upsert failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
 def main():
     """Main function to process the CSV and create embeddings"""
     try:
         # Create or get index
         index = create_index_if_not_exists()
+        open_embedding_cache()
         
-        # Read CSV file
+        # Stream the CSV in 1000-row chunks instead of loading it whole, then
+        # split them into batches; chunk indexes continue across chunks, so
+        # vector ids are unchanged
         logger.info("Reading CSV file...")
-        df = pd.read_csv('ScrappedCitycopy.csv')
-        logger.info(f"Loaded {len(df)} records from CSV")
-        
-        # Process in batches
         batch_size = 100
-        for i in tqdm(range(0, len(df), batch_size)):
-            batch_df = df.iloc[i:i + batch_size]
-            process_batch(index, batch_df, batch_size)
-            time.sleep(1)  # Rate limiting
+        reader = pd.read_csv('ScrappedCitycopy.csv', chunksize=CSV_CHUNK_ROWS)
+        
+        # Process batches concurrently; the client backs off on rate limits.
+        # Only a few batches are in flight so memory stays bounded
+        records = 0
+        pending = set()
+        with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as executor, tqdm(unit='batch') as progress:
+            for chunk_df in reader:
+                records += len(chunk_df)
+                for start in range(0, len(chunk_df), batch_size):
+                    batch_df = chunk_df.iloc[start:start + batch_size]
+                    pending.add(executor.submit(process_batch, index, batch_df, batch_size))
+                    if len(pending) >= INGEST_WORKERS * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                            progress.update()
+            for future in pending:
+                future.result()
+                progress.update()
+        logger.info(f"Processed {records} records from CSV")
         
         logger.info("Embedding creation completed successfully")
         
     except Exception as e:
         logger.error(f"Error in main process: {e}")
         raise
+    finally:
+        close_embedding_cache()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,7 +2,9 @@ from pinecone import Pinecone
 import os
 from dotenv import load_dotenv
 import json
+from collections import Counter
 from openai import OpenAI
+import httpx
 import logging
 
 # Configure logging
@@ -12,10 +14,18 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# One client for the whole run so embedding calls reuse pooled connections
+client = OpenAI(
+    api_key=os.getenv('OPENAI_API_KEY'),
+    http_client=httpx.Client(
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        timeout=30
+    )
+)
+
 def create_embedding(text):
     """Create an embedding using OpenAI's API"""
     try:
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
         response = client.embeddings.create(
             input=text,
             model="text-embedding-ada-002",
@@ -38,6 +48,9 @@ def inspect_pinecone_index():
         print(f"Total vector count: {stats.total_vector_count}")
         print(f"Dimension: {stats.dimension}")
         
+        # Metadata-only probe vector, reused by every sample query below
+        zero_vector = [0.0] * stats.dimension
+        
         if hasattr(stats, 'namespaces'):
             print("\nNamespaces:")
             for ns, count in stats.namespaces.items():
@@ -45,25 +58,21 @@ def inspect_pinecone_index():
         
         # 2. Category Distribution
         print("\n=== 2. Category Analysis ===")
-        categories = {}
-        cities = set()
         
         # Sample 100 records to get distribution
         query_response = index.query(
-            vector=[0] * stats.dimension,
+            vector=zero_vector,
             top_k=100,
             include_metadata=True
         )
         
-        for match in query_response.matches:
-            if 'category' in match.metadata:
-                cat = match.metadata['category']
-                categories[cat] = categories.get(cat, 0) + 1
-            if 'city' in match.metadata:
-                cities.add(match.metadata['city'])
+        categories = Counter(
+            match.metadata['category'] for match in query_response.matches if 'category' in match.metadata
+        )
+        cities = {match.metadata['city'] for match in query_response.matches if 'city' in match.metadata}
         
         print("\nCategory Distribution:")
-        for cat, count in sorted(categories.items(), key=lambda x: x[1], reverse=True):
+        for cat, count in categories.most_common():
             print(f"{cat}: {count}")
         
         # 3. Restaurant-Specific Search
@@ -95,20 +104,22 @@ def inspect_pinecone_index():
                     field_stats[field] = {
                         'count': 0,
                         'empty': 0,
-                        'sample_values': set()
+                        'sample_values': []
                     }
                 field_stats[field]['count'] += 1
                 if not value:
                     field_stats[field]['empty'] += 1
-                if len(field_stats[field]['sample_values']) < 3:
-                    field_stats[field]['sample_values'].add(str(value))
+                # Keep the first 3 distinct raw values; only stringify when printing
+                samples = field_stats[field]['sample_values']
+                if len(samples) < 3 and value not in samples:
+                    samples.append(value)
         
         print("\nField Statistics:")
         for field, stats in field_stats.items():
             print(f"\n{field}:")
             print(f"Present in {stats['count']}/100 records")
             print(f"Empty in {stats['empty']} records")
-            print(f"Sample values: {', '.join(list(stats['sample_values'])[:3])}")
+            print(f"Sample values: {', '.join(map(str, stats['sample_values']))}")
         
         # 5. City Case Sensitivity Test
         print("\n=== 5. City Case Sensitivity Test ===")
@@ -118,7 +129,7 @@ def inspect_pinecone_index():
         test_cases = ["Austin", "austin", "AUSTIN"]
         for city in test_cases:
             results = index.query(
-                vector=[0] * stats.dimension,
+                vector=zero_vector,
                 top_k=1,
                 include_metadata=True,
                 filter={"city": city}
@@ -1,13 +1,14 @@
 import os
 from dotenv import load_dotenv
 import logging
-from app.services.pinecone_service import search_places, get_place_details
+from app.services.pinecone_service import fetch_candidate_matches, process_search_results, get_place_details
 from app.services.openai_service import process_user_query
 from rich.console import Console
 from rich.table import Table
 from rich import print as rprint
 import time
 from statistics import mean
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -18,6 +19,9 @@ load_dotenv()
 
 console = Console()
 
+# Test cases run concurrently
+_case_pool = ThreadPoolExecutor(max_workers=4)
+
 def format_metadata(metadata):
     """Format metadata for display"""
     return {
@@ -37,31 +41,31 @@ def verify_results(results, expected_category=None, expected_features=None, min_
         return False, "No results found"
     
     verifications = []
+    # Search results are plain dicts from process_search_results
+    metadatas = [r['metadata'] for r in results]
     
     # Category verification
     if expected_category:
-        category_match = any(expected_category.lower() in r.metadata.get('category', '').lower() for r in results)
+        category = expected_category.lower()
+        category_match = any(category in m.get('category', '').lower() for m in metadatas)
         verifications.append(('Category', category_match))
     
-    # Features verification
+    # Features verification; each about text and feature is lowercased once
     if expected_features:
-        feature_matches = []
-        for result in results:
-            about = result.metadata.get('about', '').lower()
-            feature_match = all(feature.lower() in about for feature in expected_features)
-            feature_matches.append(feature_match)
-        verifications.append(('Features', any(feature_matches)))
+        features = [feature.lower() for feature in expected_features]
+        abouts = [m.get('about', '').lower() for m in metadatas]
+        verifications.append(('Features', any(all(f in about for f in features) for about in abouts)))
     
     # Rating verification
     if min_rating:
-        rating_match = all(float(r.metadata.get('rating', 0)) >= min_rating for r in results)
+        rating_match = all(float(m.get('rating', 0)) >= min_rating for m in metadatas)
         verifications.append(('Rating', rating_match))
     
     # Price verification
     if price_preference:
         price_matches = []
-        for result in results:
-            price_level = len(result.metadata.get('price_level', '$').split('$')[0]) + 1
+        for metadata in metadatas:
+            price_level = metadata.get('price_level', '$').count('$')
             if price_preference == 'cheap':
                 price_matches.append(price_level <= 2)
             elif price_preference == 'moderate':
@@ -98,26 +102,24 @@ def display_results(query, results, verification_details=None):
     table.add_column("Features", style="white")
     
     for i, result in enumerate(results, 1):
-        features = result.metadata.get('about', '')[:50] + '...' if result.metadata.get('about') else 'N/A'
+        metadata = result['metadata']
+        features = metadata.get('about', '')[:50] + '...' if metadata.get('about') else 'N/A'
         table.add_row(
             str(i),
-            f"{getattr(result, 'combined_score', result.score):.3f}",
-            result.metadata.get('title', 'N/A'),
-            result.metadata.get('category', 'N/A'),
-            f"{float(result.metadata.get('rating', 0)):.1f}",
-            str(int(result.metadata.get('reviews', 0))),
-            result.metadata.get('price_level', 'N/A'),
+            f"{result['score']:.3f}",
+            metadata.get('title', 'N/A'),
+            metadata.get('category', 'N/A'),
+            f"{float(metadata.get('rating', 0)):.1f}",
+            str(int(metadata.get('reviews', 0))),
+            metadata.get('price_level', 'N/A'),
             features
         )
     
     console.print(table)
     console.print("\n")
 
-def test_search(query_text, expected_category=None, expected_features=None, min_rating=None, 
-                price_preference=None, city="Austin", coordinates=None):
-    """Enhanced test search functionality with comprehensive verification"""
-    console.print(f"\n[bold blue]Testing Query:[/bold blue] {query_text}")
-    
+def run_search(query_text, min_rating=None, price_preference=None, city="Austin", coordinates=None):
+    """Process a query, fetch its candidates once and rank them for each sort variant"""
     # Process the query
     query_info = process_user_query(query_text)
     
@@ -132,25 +134,40 @@ def test_search(query_text, expected_category=None, expected_features=None, min_
     if min_rating:
         query_info['min_rating'] = min_rating
     
-    console.print(f"[bold yellow]Processed Query:[/bold yellow]", query_info)
-    
     # Test different sorting options
     sort_options = ['best_match', 'rating_high', 'price_low']
     if coordinates:
         sort_options.append('distance')
     
-    results_summary = []
+    # Every sort variant ranks the same candidates, so query Pinecone once
+    start_time = time.time()
+    matches = fetch_candidate_matches(query_info, top_k=5)
+    fetch_time = time.time() - start_time
+    
+    searches = []
     for sort_by in sort_options:
-        console.print(f"\n[bold green]Testing sort_by=[/bold green] {sort_by}")
-        
         start_time = time.time()
-        results = search_places(
-            query_info=query_info,
-            top_k=5,
-            sort_by=sort_by,
-            limit=5
-        )
-        search_time = time.time() - start_time
+        results = process_search_results(matches, query_info, sort_by, limit=5) if matches else []
+        searches.append((sort_by, results, fetch_time + time.time() - start_time))
+    
+    return query_info, searches
+
+def test_search(query_text, expected_category=None, expected_features=None, min_rating=None, 
+                price_preference=None, city="Austin", coordinates=None, search=None):
+    """Enhanced test search functionality with comprehensive verification"""
+    console.print(f"\n[bold blue]Testing Query:[/bold blue] {query_text}")
+    
+    # Use the already running search when one is given
+    if search is None:
+        query_info, searches = run_search(query_text, min_rating, price_preference, city, coordinates)
+    else:
+        query_info, searches = search.result()
+    
+    console.print(f"[bold yellow]Processed Query:[/bold yellow]", query_info)
+    
+    results_summary = []
+    for sort_by, results, search_time in searches:
+        console.print(f"\n[bold green]Testing sort_by=[/bold green] {sort_by}")
         
         if results:
             success, verification_details = verify_results(
@@ -191,6 +208,22 @@ def test_search(query_text, expected_category=None, expected_features=None, min_
     
     console.print("\n" + "="*80 + "\n")
 
+def run_test_searches(searches):
+    """Start every search up front, then report them in order"""
+    runs = [
+        _case_pool.submit(
+            run_search,
+            search["query_text"],
+            search.get("min_rating"),
+            search.get("price_preference"),
+            search.get("city", "Austin"),
+            search.get("coordinates")
+        )
+        for search in searches
+    ]
+    for search, run in zip(searches, runs):
+        test_search(**search, search=run)
+
 def test_restaurants():
     """Test restaurant-related queries with enhanced criteria"""
     test_cases = [
@@ -220,14 +253,16 @@ def test_restaurants():
     ]
     
     console.print("[bold cyan]Testing Restaurant Queries[/bold cyan]")
-    for case in test_cases:
-        test_search(
-            case["query"],
+    run_test_searches([
+        dict(
+            query_text=case["query"],
             expected_category=case.get("category"),
             expected_features=case.get("features"),
             min_rating=case.get("min_rating"),
             price_preference=case.get("price_preference")
         )
+        for case in test_cases
+    ])
 
 def test_location_based():
     """Test location-based queries with coordinates"""
@@ -253,13 +288,15 @@ def test_location_based():
     ]
     
     console.print("[bold cyan]Testing Location-Based Queries[/bold cyan]")
-    for case in test_cases:
-        test_search(
-            case["query"],
+    run_test_searches([
+        dict(
+            query_text=case["query"],
             expected_category=case.get("category"),
             min_rating=case.get("min_rating"),
             coordinates=case["coordinates"]
         )
+        for case in test_cases
+    ])
 
 def test_feature_based():
     """Test feature-specific queries"""
@@ -282,12 +319,14 @@ def test_feature_based():
     ]
     
     console.print("[bold cyan]Testing Feature-Based Queries[/bold cyan]")
-    for case in test_cases:
-        test_search(
-            case["query"],
+    run_test_searches([
+        dict(
+            query_text=case["query"],
             expected_category=case.get("category"),
             expected_features=case["features"]
         )
+        for case in test_cases
+    ])
 
 def test_price_based():
     """Test price-based queries"""
@@ -310,13 +349,15 @@ def test_price_based():
     ]
     
     console.print("[bold cyan]Testing Price-Based Queries[/bold cyan]")
-    for case in test_cases:
-        test_search(
-            case["query"],
+    run_test_searches([
+        dict(
+            query_text=case["query"],
             expected_category=case.get("category"),
             min_rating=case.get("min_rating"),
             price_preference=case["price_preference"]
         )
+        for case in test_cases
+    ])
 
 def main():
     """Run enhanced test suite"""